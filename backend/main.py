@@ -1,31 +1,88 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import os
+import asyncio
+import logging
+import logging.handlers
+import queue
+import orjson
 from dotenv import load_dotenv
-from datetime import datetime
+from functools import lru_cache
 
 load_dotenv()
 
+# Logging: records go onto a queue and a background listener does the
+# actual stream I/O, so request handlers never block on stdout
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue,
+    logging.StreamHandler(),
+    respect_handler_level=True
+)
+logging.basicConfig(
+    level=logging.DEBUG if os.getenv("DEBUG", "false").lower() == "true" else logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
+)
+logger = logging.getLogger("meditrack")
+
 # Import routers
 from routers import upload, history, memory, tracking, alerts
+from services.clock import iso_now_cached
 
-# Import tracking service
-from services.tracking_service import TrackingService
+# Import memory store
+from memory.memory_store import get_memory_store
 
-app = FastAPI(title="MediTrack API", version="1.0.0")
+# orjson encodes responses (and datetimes) much faster than stdlib json
+app = FastAPI(
+    title="MediTrack API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
 
 # Global tracking service instance
 tracking_service = None
 
+# Background task that flushes batched pattern writes
+memory_flush_task = None
+
+# CORS origins (comma-separated), defaults to the local frontend dev servers
+CORS_ORIGINS = os.getenv(
+    "CORS_ORIGINS",
+    "http://localhost:3000,http://127.0.0.1:3000,http://localhost:5173"
+).split(",")
+
 # CORS middleware
+# max_age lets browsers cache preflight responses instead of sending
+# an OPTIONS request before every cross-origin call
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=[origin.strip() for origin in CORS_ORIGINS if origin.strip()],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
+# Compress larger JSON responses (history, tracks, topology)
+# Small bodies are sent as-is, compressing them costs more than it saves
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# One app-wide handler for unexpected errors instead of a try/except in
+# every endpoint; details go to the log, not to the client
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    logger.error(
+        "Unhandled error on %s %s", request.method, request.url.path,
+        exc_info=exc
+    )
+    return ORJSONResponse(
+        {"success": False, "error": "internal"},
+        status_code=500
+    )
+
 # Include routers
 app.include_router(upload.router)
 app.include_router(history.router)
@@ -37,52 +94,83 @@ app.include_router(alerts.router)
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup."""
-    global tracking_service
+    global tracking_service, memory_flush_task
     
-    print("\n" + "="*50)
-    print("MediTrack API starting")
-    print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Debug: {os.getenv('DEBUG', 'false')}")
-    print(f"Data directory: {os.path.abspath('./data')}")
-    print("="*50 + "\n")
+    _log_listener.start()
     
-    # Initialize tracking service with topology
+    logger.info("MediTrack API starting")
+    logger.info("Debug: %s", os.getenv('DEBUG', 'false'))
+    logger.info("Data directory: %s", os.path.abspath('./data'))
+    
+    # Warm the tracking router's shared service (loads scipy/networkx lazily)
     try:
-        tracking_service = TrackingService()
-        tracking_service.load_topology()
-        print("Tracking service initialized")
-        print(f"  Nodes: {len(tracking_service.nodes)}")
-        print(f"  Edges: {len(tracking_service.edges)}\n")
+        tracking_service = tracking.get_tracking_service()
+        logger.info(
+            "Tracking service initialized (%d nodes, %d edges)",
+            len(tracking_service.nodes), len(tracking_service.edges)
+        )
     except Exception as e:
-        print(f"Warning: Tracking service initialization failed - {e}")
-        print("Tracking features will not be available\n")
+        logger.warning("Tracking service initialization failed - %s", e)
+        logger.warning("Tracking features will not be available")
+    
+    # Load the memory store now rather than on the first request, and
+    # flush pattern changes in the background instead of on every insert
+    memory_store = get_memory_store()
+    memory_flush_task = asyncio.create_task(memory_store.run_flush_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Persist pending memory changes, close outbound connections and stop
+    the tracking solver threads on shutdown.
+    """
+    if memory_flush_task:
+        memory_flush_task.cancel()
+    get_memory_store().flush()
+    await upload.memories_client.aclose()
+    
+    # Imported here like the tracking service itself, which loads it lazily
+    from services.tracking_service import shutdown_solver_pool
+    shutdown_solver_pool()
+    _log_listener.stop()
+
+
+# Root response never changes, so serialize it once
+ROOT_BODY = orjson.dumps({
+    "service": "MediTrack API",
+    "version": "1.0.0",
+    "status": "running",
+    "endpoints": {
+        "upload": "/api/upload",
+        "history": "/api/history",
+        "memory": "/api/memory",
+        "tracking": "/api/track/associate",
+        "health": "/api/health"
+    }
+})
 
 
 @app.get("/")
 async def root():
     """Root endpoint."""
-    return {
-        "service": "MediTrack API",
-        "version": "1.0.0",
-        "status": "running",
-        "endpoints": {
-            "upload": "/api/upload",
-            "history": "/api/history",
-            "memory": "/api/memory",
-            "tracking": "/api/track/associate",
-            "health": "/api/health"
-        }
-    }
+    return Response(content=ROOT_BODY, media_type="application/json")
+
+
+@lru_cache(maxsize=1)
+def _health_body(timestamp: str) -> bytes:
+    """Health response body, serialized once per distinct timestamp."""
+    return orjson.dumps({
+        "status": "healthy",
+        "service": "MediTrack",
+        "timestamp": timestamp
+    })
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint."""
-    return {
-        "status": "healthy",
-        "service": "MediTrack",
-        "timestamp": datetime.now().isoformat()
-    }
+    return Response(content=_health_body(iso_now_cached()), media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -4,7 +4,8 @@ Adds medical equipment categories and criticality levels.
 """
 
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from types import MappingProxyType
 from typing import Optional
 
 class EquipmentCategory(str, Enum):
@@ -23,6 +24,9 @@ class MedicalEquipment(BaseModel):
     - Where it should normally be
     - When to alert if missing
     """
+    # Shared, read-only reference data
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     category: EquipmentCategory
     typical_locations: list[str]  # Where it should be
@@ -91,6 +95,10 @@ MEDICAL_EQUIPMENT_TYPES = {
     )
 }
 
+# Read-only view used for lookups, plus the name normalization table
+_EQUIPMENT_LOOKUP = MappingProxyType(MEDICAL_EQUIPMENT_TYPES)
+_NORMALIZE_NAME = str.maketrans({" ": "_"})
+
 def get_equipment_info(equipment_name: str) -> Optional[MedicalEquipment]:
     """
     Get information about a type of equipment.
@@ -106,4 +114,4 @@ def get_equipment_info(equipment_name: str) -> Optional[MedicalEquipment]:
         if info and info.alert_on_movement:
             send_alert("Critical equipment moved!")
     """
-    return MEDICAL_EQUIPMENT_TYPES.get(equipment_name.lower().replace(" ", "_"))
+    return _EQUIPMENT_LOOKUP.get(equipment_name.translate(_NORMALIZE_NAME).lower())
@@ -3,12 +3,21 @@ Persistent memory storage system.
 Handles saving/loading memories to/from disk.
 """
 
-import json
+import orjson
 import os
+import asyncio
+import mmap
+import sys
+import anyio
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from pathlib import Path
+from pydantic import BaseModel
 import threading
+import logging
+from functools import lru_cache
+from bisect import bisect_left, bisect_right
+from operator import attrgetter, itemgetter
 from .memory_types import (
     ObjectMemory, 
     PatternMemory, 
@@ -18,13 +27,64 @@ from .memory_types import (
 )
 from .healthcare_types import get_equipment_info, EquipmentCategory
 
+logger = logging.getLogger("meditrack.memory")
+
+
+def _insert_by_time(memories: List[ObjectMemory], memory: ObjectMemory):
+    """
+    Insert a memory into a list kept in timestamp order (oldest first).
+    
+    New memories are almost always the newest, so this is usually an append.
+    """
+    if not memories or memories[-1].timestamp <= memory.timestamp:
+        memories.append(memory)
+    else:
+        index = bisect_right(memories, memory.timestamp, key=attrgetter('timestamp'))
+        memories.insert(index, memory)
+
+
+def _load_json_file(path: Path) -> Any:
+    """
+    Parse a JSON file through a read-only memory map.
+    orjson reads the mapped pages directly, with no intermediate copy.
+    
+    Returns None for an empty file.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def _model_fields(model: BaseModel) -> Dict[str, Any]:
+    """
+    orjson default hook for pydantic models.
+    Hands over the field dict as-is, so orjson encodes it (datetimes
+    included) in one pass without a model_dump() copy per model.
+    """
+    return model.__dict__
+
+
+def _atomic_write(path: Path, data: bytes):
+    """
+    Replace a file's contents without ever leaving it half-written.
+    Writes to a sibling .tmp file, then renames it over the target.
+    """
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
 class MemoryStore:
     """
     Manages persistent storage of all memories.
     
     Architecture:
         - Keeps memories in RAM for fast access
-        - Saves to disk after every change
+        - Saves memories to disk after every change
+        - Batches pattern writes via flush()
         - Loads from disk on startup
         - Thread-safe with locks
     """
@@ -41,7 +101,10 @@ class MemoryStore:
         self.data_dir.mkdir(exist_ok=True)
         
         # File paths for different memory types
-        self.memory_file = self.data_dir / "object_memories.json"
+        # Object memories are an append-only JSONL log (one memory per line)
+        self.memory_file = self.data_dir / "object_memories.jsonl"
+        # Older versions kept them as one JSON array, imported on first load
+        self.legacy_memory_file = self.data_dir / "object_memories.json"
         self.patterns_file = self.data_dir / "patterns.json"
         self.system_file = self.data_dir / "system_memories.json"
         
@@ -50,103 +113,213 @@ class MemoryStore:
         self._pattern_memories: Dict[str, PatternMemory] = {}
         self._system_memories: List[SystemMemory] = []
         
-        # Thread lock for safe concurrent access
-        self._lock = threading.RLock()
-        # RLock = Reentrant Lock (same thread can acquire multiple times)
+        # Secondary indexes over _object_memories
+        # _by_name lists are kept in insertion (oldest first) order
+        self._by_name: Dict[str, List[ObjectMemory]] = {}
+        self._by_id: Dict[str, ObjectMemory] = {}
+        
+        # Number of memories per object name (as stored, not lowercased)
+        self._object_counts: Dict[str, int] = {}
+        
+        # Flat per-object views of every pattern's top location and its
+        # share of observations (%), kept in sync with _pattern_memories
+        # Lets "which objects are out of place" scan one dict of floats
+        self._pattern_top_loc: Dict[str, str] = {}
+        self._pattern_top_pct: Dict[str, float] = {}
+        
+        # Pattern changes are batched and written by flush()
+        self._patterns_dirty = False
+        
+        # One lock per collection so unrelated reads don't block each other
+        # Lock order when nesting: objects -> patterns -> system
+        self._obj_lock = threading.Lock()
+        self._pattern_lock = threading.Lock()
+        self._sys_lock = threading.Lock()
         
         # Load existing memories from disk
         self._load_all_memories()
         
-        print(f" Memory Store initialized")
-        print(f"    Data directory: {self.data_dir}")
-        print(f"    Loaded {len(self._object_memories)} object memories")
-        print(f"    Loaded {len(self._pattern_memories)} patterns")
+        logger.info(
+            "Memory Store initialized (data directory: %s, %d object memories, %d patterns)",
+            self.data_dir, len(self._object_memories), len(self._pattern_memories)
+        )
     
     # ===== PRIVATE METHODS (Loading/Saving) =====
     
     def _load_all_memories(self):
         """Load all memories from disk into RAM"""
+        self._migrate_json_memories()
+        
         try:
             # Load object memories
             if self.memory_file.exists():
-                print(f"   Loading object memories from {self.memory_file}...")
-                with open(self.memory_file, 'r') as f:
-                    data = json.load(f)
-                    # Convert each dict to ObjectMemory model
-                    self._object_memories = [
-                        ObjectMemory(**mem) for mem in data
-                    ]
-                print(f" Loaded {len(self._object_memories)} object memories")
+                logger.debug("Loading object memories from %s", self.memory_file)
+                with open(self.memory_file, 'rb') as f:
+                    # Stream line by line, one ObjectMemory per line
+                    # Data was written by us, so skip Pydantic validation
+                    for line in f:
+                        if line.strip():
+                            mem = orjson.loads(line)
+                            mem['timestamp'] = datetime.fromisoformat(mem['timestamp'])
+                            mem['location_description'] = sys.intern(mem['location_description'])
+                            self._object_memories.append(
+                                ObjectMemory.model_construct(**mem)
+                            )
+                
+                # Keep memories oldest first (near-free when already ordered)
+                self._object_memories.sort(key=attrgetter('timestamp'))
+                for memory in self._object_memories:
+                    self._index_object_memory(memory)
+                logger.debug("Loaded %d object memories", len(self._object_memories))
             
             # Load pattern memories
             if self.patterns_file.exists():
-                print(f"   Loading patterns from {self.patterns_file}...")
-                with open(self.patterns_file, 'r') as f:
-                    data = json.load(f)
+                logger.debug("Loading patterns from %s", self.patterns_file)
+                data = _load_json_file(self.patterns_file)
+                if data:
                     # Convert each dict to PatternMemory model
+                    for pattern in data.values():
+                        pattern['last_updated'] = datetime.fromisoformat(pattern['last_updated'])
+                        pattern['location_frequency'] = {
+                            sys.intern(location): count
+                            for location, count in pattern['location_frequency'].items()
+                        }
                     self._pattern_memories = {
-                        name: PatternMemory(**pattern)
+                        name: PatternMemory.model_construct(**pattern)
                         for name, pattern in data.items()
                     }
-                print(f" Loaded {len(self._pattern_memories)} patterns")
+                    for name, pattern in self._pattern_memories.items():
+                        self._sync_pattern_top(name, pattern)
+                logger.debug("Loaded %d patterns", len(self._pattern_memories))
             
             # Load system memories
             if self.system_file.exists():
-                print(f"   Loading system memories from {self.system_file}...")
-                with open(self.system_file, 'r') as f:
-                    data = json.load(f)
+                logger.debug("Loading system memories from %s", self.system_file)
+                data = _load_json_file(self.system_file)
+                if data:
+                    for mem in data:
+                        mem['timestamp'] = datetime.fromisoformat(mem['timestamp'])
+                        mem['memory_type'] = MemoryType(mem['memory_type'])
                     self._system_memories = [
-                        SystemMemory(**mem) for mem in data
+                        SystemMemory.model_construct(**mem) for mem in data
                     ]
-                print(f" Loaded {len(self._system_memories)} system memories")
+                logger.debug("Loaded %d system memories", len(self._system_memories))
                 
         except Exception as e:
-            print(f"  Error loading memories: {e}")
-            print(f"  Starting with empty memory store")
+            logger.error("Error loading memories: %s", e)
+            logger.warning("Starting with empty memory store")
             # Initialize empty if loading fails
             self._object_memories = []
             self._pattern_memories = {}
             self._system_memories = []
+            self._by_name = {}
+            self._by_id = {}
+            self._object_counts = {}
+            self._pattern_top_loc = {}
+            self._pattern_top_pct = {}
     
-    def _save_object_memories(self):
-        """Save object memories to disk"""
+    def _migrate_json_memories(self):
+        """
+        Import object_memories.json (the pre-JSONL format) into the log,
+        then set the file aside so it is only imported once.
+        """
+        if not self.legacy_memory_file.exists():
+            return
         try:
-            # Convert ObjectMemory models to dictionaries
-            data = [mem.dict() for mem in self._object_memories]
+            data = _load_json_file(self.legacy_memory_file) or []
+            # Written with default=str, so validate to get datetimes back
+            lines = [
+                orjson.dumps(ObjectMemory(**mem).__dict__, option=orjson.OPT_APPEND_NEWLINE)
+                for mem in data
+            ]
+            
+            # Legacy memories go first; anything already logged is kept
+            if self.memory_file.exists():
+                lines.append(self.memory_file.read_bytes())
+            _atomic_write(self.memory_file, b"".join(lines))
+            
+            self.legacy_memory_file.rename(self.legacy_memory_file.with_suffix(".json.migrated"))
+            logger.info("Imported %d object memories from %s", len(data), self.legacy_memory_file)
+        except Exception as e:
+            logger.error("Error migrating object memories: %s", e)
+    
+    def _index_object_memory(self, memory: ObjectMemory):
+        """Add a memory to the name and id indexes"""
+        _insert_by_time(
+            self._by_name.setdefault(memory.object_key, []),
+            memory
+        )
+        self._by_id[memory.id] = memory
+        self._object_counts[memory.object_name] = \
+            self._object_counts.get(memory.object_name, 0) + 1
+    
+    def _append_object_memory(self, memory: ObjectMemory):
+        """Append a single object memory to the log on disk"""
+        try:
+            # One line per memory, so a write is O(1) regardless of store size
+            with open(self.memory_file, 'ab') as f:
+                # The field dict is encoded as-is (no model_dump() copy);
+                # orjson serializes datetime objects natively
+                f.write(orjson.dumps(memory.__dict__, option=orjson.OPT_APPEND_NEWLINE))
             
-            # Write to file with pretty formatting
-            with open(self.memory_file, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-                # default=str handles datetime objects
+        except Exception as e:
+            logger.error("Failed to append object memory: %s", e)
+    
+    def _save_object_memories(self):
+        """
+        Compact the object memory log.
+        Rewrites the whole file, so only used when memories are removed.
+        """
+        try:
+            lines = [
+                orjson.dumps(mem.__dict__, option=orjson.OPT_APPEND_NEWLINE)
+                for mem in self._object_memories
+            ]
+            _atomic_write(self.memory_file, b"".join(lines))
             
         except Exception as e:
-            print(f"Failed to save object memories: {e}")
+            logger.error("Failed to save object memories: %s", e)
     
     def _save_pattern_memories(self):
         """Save pattern memories to disk"""
         try:
-            # Convert PatternMemory models to dictionaries
-            data = {
-                name: pattern.dict() 
-                for name, pattern in self._pattern_memories.items()
-            }
+            # Encoded straight from the models, no intermediate dicts
+            data = orjson.dumps(self._pattern_memories, default=_model_fields)
+            
+            _atomic_write(self.patterns_file, data)
             
-            with open(self.patterns_file, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-                
         except Exception as e:
-            print(f"Failed to save pattern memories: {e}")
+            logger.error("Failed to save pattern memories: %s", e)
+    
+    def flush(self):
+        """Write pattern memories to disk if they changed since the last flush"""
+        with self._pattern_lock:
+            if self._patterns_dirty:
+                self._save_pattern_memories()
+                self._patterns_dirty = False
+    
+    async def run_flush_loop(self, interval: float = 1.0):
+        """
+        Periodically flush pending pattern changes.
+        Many inserts between two ticks turn into a single file write.
+        
+        Args:
+            interval: Seconds between flushes
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.flush()
     
     def _save_system_memories(self):
         """Save system memories to disk"""
         try:
-            data = [mem.dict() for mem in self._system_memories]
+            data = [mem.model_dump() for mem in self._system_memories]
+            
+            # default=str covers arbitrary values in metadata
+            _atomic_write(self.system_file, orjson.dumps(data, default=str))
             
-            with open(self.system_file, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-                
         except Exception as e:
-            print(f"Failed to save system memories: {e}")
+            logger.error("Failed to save system memories: %s", e)
     
     # ===== PUBLIC METHODS (Object Memories) =====
     
@@ -168,23 +341,48 @@ class MemoryStore:
             )
             memory_id = store.store_object_memory(memory)
         """
-        with self._lock:  # Thread-safe
+        # Repeated locations share one string object with the pattern keys
+        memory.location_description = sys.intern(memory.location_description)
+        
+        with self._obj_lock:  # Thread-safe
             # Add to in-memory list
-            self._object_memories.append(memory)
+            _insert_by_time(self._object_memories, memory)
+            self._index_object_memory(memory)
             
+            # Append to disk
+            self._append_object_memory(memory)
+        
+        with self._pattern_lock:
             # Update patterns based on this memory
             self._update_object_patterns(memory)
+        
+
+        logger.debug("Stored memory: %s at %s", memory.object_name, memory.location_description)
+        return memory.id
+    
+    async def store_object_memory_async(self, memory: ObjectMemory) -> str:
+        """
+        Store a new object detection memory from async code.
+        
+        Runs store_object_memory in a worker thread so the lock wait and
+        disk write don't block the event loop.
+        
+        Args:
+            memory: The memory to store
             
-            # Save to disk
-            self._save_object_memories()
+        Returns:
+            The memory's ID
             
-            print(f"Stored memory: {memory.object_name} at {memory.location_description}")
-            return memory.id
+        Example:
+            memory_id = await store.store_object_memory_async(memory)
+        """
+        return await anyio.to_thread.run_sync(self.store_object_memory, memory)
     
     def get_object_memories(
         self, 
         object_name: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        since: Optional[datetime] = None
     ) -> List[ObjectMemory]:
         """
         Retrieve object memories, optionally filtered by object name.
@@ -192,6 +390,7 @@ class MemoryStore:
         Args:
             object_name: Filter by object name (None = all objects)
             limit: Maximum number of memories to return
+            since: Only return memories at or after this time (None = no limit)
             
         Returns:
             List of memories (newest first)
@@ -202,26 +401,62 @@ class MemoryStore:
             
             # Get all memories for all objects
             all_memories = store.get_object_memories()
-        """
-        with self._lock:
-            memories = self._object_memories
             
+            # Get memories for "keys" from the last 6 hours
+            recent = store.get_object_memories(
+                object_name="keys",
+                since=datetime.now() - timedelta(hours=6)
+            )
+        """
+        if limit <= 0:
+            return []
+        
+        with self._obj_lock:
             # Filter by object name if specified
             if object_name:
-                memories = [
-                    m for m in memories 
-                    if m.object_name.lower() == object_name.lower()
-                ]
-            
-            # Sort by timestamp (newest first)
-            memories = sorted(
-                memories, 
-                key=lambda x: x.timestamp, 
-                reverse=True
-            )
+                memories = self._by_name.get(object_name.lower(), [])
+            else:
+                memories = self._object_memories
+            
+            # Lists are kept oldest first, so the newest are a tail slice
+            start = len(memories) - limit
+            if since is not None:
+                # Binary search the window start instead of filtering rows
+                start = max(start, bisect_left(memories, since, key=attrgetter('timestamp')))
+            
+            return memories[max(start, 0):][::-1]
+    
+    def get_object_counts(self) -> Dict[str, int]:
+        """
+        Get how many memories are stored for each object.
+        
+        Returns:
+            Dictionary of object_name -> memory count
             
-            # Limit results
-            return memories[:limit]
+        Example:
+            counts = store.get_object_counts()
+            print(f"Keys seen {counts.get('keys', 0)} times")
+        """
+        with self._obj_lock:
+            return self._object_counts.copy()
+    
+    def count_object_memories(self, object_name: str) -> int:
+        """
+        Count memories for one object without materializing them.
+        
+        Args:
+            object_name: Object to count (case-insensitive)
+        
+        Returns:
+            Number of stored memories for that object
+        
+        Example:
+            store.count_object_memories("keys")
+            → 42
+        """
+        with self._obj_lock:
+            # Reads the length of the per-object index list
+            return len(self._by_name.get(object_name.lower(), ()))
     
     def get_recent_memories(
         self, 
@@ -236,7 +471,7 @@ class MemoryStore:
             hours: How many hours back to look
             
         Returns:
-            List of memories within time window
+            List of memories within time window (newest first)
             
         Example:
             # Get memories from last 24 hours
@@ -244,14 +479,12 @@ class MemoryStore:
         """
         since = datetime.now() - timedelta(hours=hours)
         
-        with self._lock:
-            memories = [
-                m for m in self._object_memories
-                if m.object_name.lower() == object_name.lower()
-                and m.timestamp >= since
-            ]
+        with self._obj_lock:
+            memories = self._by_name.get(object_name.lower(), [])
             
-            return sorted(memories, key=lambda x: x.timestamp, reverse=True)
+            # Index list is sorted by timestamp, so binary search the window start
+            start = bisect_left(memories, since, key=attrgetter('timestamp'))
+            return memories[start:][::-1]
     
     def delete_object_memory(self, memory_id: str) -> bool:
         """
@@ -266,27 +499,48 @@ class MemoryStore:
         Example:
             success = store.delete_object_memory("abc-123-def")
         """
-        with self._lock:
-            original_count = len(self._object_memories)
+        with self._obj_lock:
+            # Find the memory first so its pattern can be updated
+            memory = self._by_id.pop(memory_id, None)
             
-            # Remove memory with this ID
-            self._object_memories = [
-                m for m in self._object_memories 
-                if m.id != memory_id
-            ]
+            if memory is None:
+                return False
             
-            # Check if anything was deleted
-            if len(self._object_memories) < original_count:
-                # Save changes
-                self._save_object_memories()
-                
-                # Recalculate patterns (since we removed data)
-                self._recalculate_all_patterns()
-                
-                print(f"Deleted memory: {memory_id}")
-                return True
+            self._object_memories.remove(memory)
+            
+            name_key = memory.object_key
+            self._by_name[name_key].remove(memory)
+            if not self._by_name[name_key]:
+                del self._by_name[name_key]
+            
+            count = self._object_counts[memory.object_name] - 1
+            if count:
+                self._object_counts[memory.object_name] = count
+            else:
+                del self._object_counts[memory.object_name]
             
-            return False
+            # Compact the log without the deleted memory
+            self._save_object_memories()
+        
+        with self._pattern_lock:
+            # Undo this memory's contribution to its pattern
+            self._remove_from_object_patterns(memory)
+        
+        logger.debug("Deleted memory: %s", memory_id)
+        return True
+    
+    async def delete_object_memory_async(self, memory_id: str) -> bool:
+        """
+        Delete a specific memory from async code.
+        Log compaction runs in a worker thread instead of the event loop.
+        
+        Args:
+            memory_id: ID of memory to delete
+            
+        Returns:
+            True if deleted, False if not found
+        """
+        return await anyio.to_thread.run_sync(self.delete_object_memory, memory_id)
     
     # ===== PUBLIC METHODS (Pattern Memories) =====
     
@@ -298,7 +552,7 @@ class MemoryStore:
         Args:
             memory: The new memory to learn from
         """
-        obj_name = memory.object_name.lower()
+        obj_name = memory.object_key
         
         # Create pattern if doesn't exist
         if obj_name not in self._pattern_memories:
@@ -310,17 +564,77 @@ class MemoryStore:
         
         # Update location frequency
         location = memory.location_description
-        pattern.location_frequency[location] = \
-            pattern.location_frequency.get(location, 0) + 1
+        frequency = pattern.location_frequency
+        count = frequency[location] = frequency.get(location, 0) + 1
         
         # Increment total observations
         pattern.total_observations += 1
         
+        # Only the incremented location can overtake the current top,
+        # so compare against it instead of rescanning every location
+        top = pattern.most_common_location
+        if top is None or count > frequency.get(top, 0):
+            top = pattern.most_common_location = location
+        pattern.consistency_score = frequency[top] / pattern.total_observations
+        pattern.last_updated = datetime.now()
+        self._sync_pattern_top(obj_name, pattern)
+        
+        # Written to disk by the next flush
+        self._patterns_dirty = True
+    
+    def _remove_from_object_patterns(self, memory: ObjectMemory):
+        """
+        Remove a deleted memory from its object's pattern.
+        Only that one object's pattern is recomputed.
+        
+        Args:
+            memory: The memory that was deleted
+        """
+        obj_name = memory.object_key
+        pattern = self._pattern_memories.get(obj_name)
+        
+        if pattern is None:
+            return
+        
+        # Decrement location frequency (drop it once it reaches zero)
+        location = memory.location_description
+        count = pattern.location_frequency.get(location, 0) - 1
+        if count > 0:
+            pattern.location_frequency[location] = count
+        else:
+            pattern.location_frequency.pop(location, None)
+        
+        pattern.total_observations = max(pattern.total_observations - 1, 0)
+        
+        # No observations left, so nothing to learn from
+        if pattern.total_observations == 0:
+            del self._pattern_memories[obj_name]
+            self._pattern_top_loc.pop(obj_name, None)
+            self._pattern_top_pct.pop(obj_name, None)
+        else:
+            if location == pattern.most_common_location:
+                # The top location lost a count, another may now lead
+                self._refresh_pattern_summary(pattern)
+            else:
+                pattern.consistency_score = \
+                    pattern.location_frequency[pattern.most_common_location] / pattern.total_observations
+                pattern.last_updated = datetime.now()
+            self._sync_pattern_top(obj_name, pattern)
+        
+        self._patterns_dirty = True
+    
+    def _refresh_pattern_summary(self, pattern: PatternMemory):
+        """
+        Recompute most common location and consistency for one pattern.
+        
+        Args:
+            pattern: The pattern whose frequencies changed
+        """
         # Update most common location
         if pattern.location_frequency:
             most_common = max(
                 pattern.location_frequency.items(),
-                key=lambda x: x[1]
+                key=itemgetter(1)
             )
             pattern.most_common_location = most_common[0]
             
@@ -328,12 +642,23 @@ class MemoryStore:
             # How often is it in the most common place?
             max_count = most_common[1]
             pattern.consistency_score = max_count / pattern.total_observations
+        else:
+            pattern.most_common_location = None
+            pattern.consistency_score = 0.0
         
         # Update timestamp
         pattern.last_updated = datetime.now()
+    
+    def _sync_pattern_top(self, obj_name: str, pattern: PatternMemory):
+        """
+        Copy a pattern's top location and its percentage into the flat views.
         
-        # Save patterns to disk
-        self._save_pattern_memories()
+        Args:
+            obj_name: Pattern key (lowercased object name)
+            pattern: The pattern that was just updated
+        """
+        self._pattern_top_loc[obj_name] = pattern.most_common_location
+        self._pattern_top_pct[obj_name] = pattern.consistency_score * 100
     
     def get_object_pattern(self, object_name: str) -> Optional[PatternMemory]:
         """
@@ -350,7 +675,7 @@ class MemoryStore:
             if pattern:
                 print(f"Keys are usually at: {pattern.most_common_location}")
         """
-        with self._lock:
+        with self._pattern_lock:
             return self._pattern_memories.get(object_name.lower())
     
     def get_all_patterns(self) -> Dict[str, PatternMemory]:
@@ -365,24 +690,50 @@ class MemoryStore:
             for obj_name, pattern in patterns.items():
                 print(f"{obj_name}: {pattern.most_common_location}")
         """
-        with self._lock:
+        with self._pattern_lock:
             return self._pattern_memories.copy()
     
+    def get_out_of_place_objects(self, threshold: float = 50.0) -> Dict[str, str]:
+        """
+        Objects that are not reliably found at their usual location.
+        
+        Args:
+            threshold: Percentage of observations at the most common
+                location below which an object counts (default 50%)
+            
+        Returns:
+            Dictionary of object_name -> most common location
+            
+        Example:
+            store.get_out_of_place_objects()
+            → {"wheelchair": "Lobby"}  (only 35% of sightings in the Lobby)
+        """
+        with self._pattern_lock:
+            top_loc = self._pattern_top_loc
+            return {
+                name: top_loc[name]
+                for name, pct in self._pattern_top_pct.items()
+                if pct < threshold
+            }
+    
     def _recalculate_all_patterns(self):
         """
         Recalculate all patterns from scratch.
-        Called after deleting memories.
+        Admin tool for repairing patterns; deletes update them incrementally.
         """
-        print("Recalculating patterns...")
-        
-        # Clear existing patterns
-        self._pattern_memories = {}
+        logger.info("Recalculating patterns...")
         
-        # Rebuild from all memories
-        for memory in self._object_memories:
-            self._update_object_patterns(memory)
+        with self._obj_lock, self._pattern_lock:
+            # Clear existing patterns
+            self._pattern_memories = {}
+            self._pattern_top_loc = {}
+            self._pattern_top_pct = {}
+            
+            # Rebuild from all memories
+            for memory in self._object_memories:
+                self._update_object_patterns(memory)
         
-        print("Patterns recalculated")
+        logger.info("Patterns recalculated")
     
     # ===== PUBLIC METHODS (System Memories) =====
     
@@ -396,7 +747,7 @@ class MemoryStore:
         Returns:
             The memory's ID
         """
-        with self._lock:
+        with self._sys_lock:
             self._system_memories.append(memory)
             self._save_system_memories()
             return memory.id
@@ -414,49 +765,56 @@ class MemoryStore:
             stats = store.get_memory_stats()
             print(f"Total memories: {stats['total_object_memories']}")
         """
-        with self._lock:
+        with self._obj_lock:
+            total_object_memories = len(self._object_memories)
+            
             # Get unique object names
-            tracked_objects = set(
-                m.object_name for m in self._object_memories
-            )
+            tracked_objects = list(self._object_counts)
             
-            # Get oldest and newest timestamps
+            # List is kept oldest first, so the ends are the extremes
             oldest = None
             newest = None
             if self._object_memories:
-                oldest = min(m.timestamp for m in self._object_memories)
-                newest = max(m.timestamp for m in self._object_memories)
-            
-            return {
-                "total_object_memories": len(self._object_memories),
-                "total_system_memories": len(self._system_memories),
-                "tracked_objects": len(tracked_objects),
-                "object_names": list(tracked_objects),
-                "total_patterns": len(self._pattern_memories),
-                "oldest_memory": oldest.isoformat() if oldest else None,
-                "newest_memory": newest.isoformat() if newest else None,
-                "data_directory": str(self.data_dir)
-            }
+                oldest = self._object_memories[0].timestamp
+                newest = self._object_memories[-1].timestamp
+        
+        # Plain len() reads, no need to hold the other locks
+        return {
+            "total_object_memories": total_object_memories,
+            "total_system_memories": len(self._system_memories),
+            "tracked_objects": len(tracked_objects),
+            "object_names": tracked_objects,
+            "total_patterns": len(self._pattern_memories),
+            "oldest_memory": oldest.isoformat() if oldest else None,
+            "newest_memory": newest.isoformat() if newest else None,
+            "data_directory": str(self.data_dir)
+        }
     
     def reset_all_memories(self):
         """
         Clear all memories.
         Use with caution! Creates backup first.
         """
-        with self._lock:
-            print("🧹 Resetting all memories...")
+        with self._obj_lock, self._pattern_lock, self._sys_lock:
+            logger.warning("Resetting all memories...")
             
             # Clear in-memory data
             self._object_memories = []
             self._pattern_memories = {}
             self._system_memories = []
+            self._by_name = {}
+            self._by_id = {}
+            self._object_counts = {}
+            self._pattern_top_loc = {}
+            self._pattern_top_pct = {}
+            self._patterns_dirty = False
             
             # Delete files
             for file_path in [self.memory_file, self.patterns_file, self.system_file]:
                 if file_path.exists():
                     file_path.unlink()
             
-            print("All memories cleared")
+            logger.info("All memories cleared")
 
     def check_critical_equipment_alert(self, memory: ObjectMemory) -> Optional[dict]:
         """
@@ -506,6 +864,17 @@ class MemoryStore:
         
         return None
 
-            
-# All parts of the app will use this same instance
-memory_store = MemoryStore()
+
+
+@lru_cache(maxsize=1)
+def get_memory_store() -> MemoryStore:
+    """
+    Shared MemoryStore instance, created on first use.
+    All parts of the app use this same instance; nothing is loaded from
+    disk just by importing this module.
+    
+    Example:
+        store = get_memory_store()
+        store.store_object_memory(memory)
+    """
+    return MemoryStore()
@@ -3,13 +3,18 @@ Data models for the memory system.
 These define the structure of all memory-related data.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from datetime import datetime
 from typing import Optional, Dict, List
 from enum import Enum
 import uuid
 
 
+# Shared by every model's Config; the unbound method avoids a lambda call
+# per datetime
+_DT_ENCODERS = {datetime: datetime.isoformat}
+
+
 # ===== ENUMS (Fixed set of values) =====
 
 class MemoryType(str, Enum):
@@ -29,8 +34,9 @@ class ObjectMemory(BaseModel):
     """
     
     # Unique identifier for this memory
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    # Example: "a7b3c4d5-e6f7-8a9b-0c1d-2e3f4a5b6c7d"
+    # .hex skips formatting the dashed string form
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    # Example: "a7b3c4d5e6f78a9b0c1d2e3f4a5b6c7d"
     
     # When was this observed?
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -60,13 +66,24 @@ class ObjectMemory(BaseModel):
     frame_path: Optional[str] = None
     # Example: "data/frames/frame_abc123.jpg"
     
+    # Lowercased object_name, computed once and used as the lookup key
+    # Private so it is never written to disk
+    _object_key: str = PrivateAttr(default="")
+    
     class Config:
         """Pydantic configuration"""
         # How to convert datetime to JSON
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-            # 2025-10-20T15:15:00 → "2025-10-20T15:15:00"
-        }
+        json_encoders = _DT_ENCODERS
+        # 2025-10-20T15:15:00 → "2025-10-20T15:15:00"
+    
+    def model_post_init(self, __context) -> None:
+        """Precompute the lookup key (also runs for model_construct)"""
+        self._object_key = self.object_name.lower()
+    
+    @property
+    def object_key(self) -> str:
+        """Normalized object name used for indexing and pattern lookup"""
+        return self._object_key
     
     def __str__(self):
         """Human-readable string representation"""
@@ -142,13 +159,13 @@ class PatternMemory(BaseModel):
             pattern.is_unusual_location("couch")
             → True (only 7% of time, below 20% threshold)
         """
-        percentage = self.get_location_percentage(location)
-        return percentage < threshold
+        # Same as get_location_percentage(location) < threshold, without the
+        # extra call and division
+        n = self.total_observations
+        return n == 0 or self.location_frequency.get(location, 0) * 100 < threshold * n
     
     class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+        json_encoders = _DT_ENCODERS
 
 
 
@@ -162,16 +179,14 @@ class SystemMemory(BaseModel):
         - "Memory backup created"
     """
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     timestamp: datetime = Field(default_factory=datetime.now)
     memory_type: MemoryType
     description: str
     metadata: Dict = Field(default_factory=dict)
     
     class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+        json_encoders = _DT_ENCODERS
 
 
 
@@ -1,35 +1,41 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, Response
+from services.clock import iso_now_cached
+import orjson
+import logging
+from typing import Literal
+from collections import OrderedDict
 
 router = APIRouter(prefix="/api/alerts", tags=["alerts"])
+logger = logging.getLogger("meditrack.alerts")
 
 # Store acknowledged/dismissed alerts (in production, use database)
-processed_alerts = set()
+# Bounded LRU: oldest entries are evicted so the store can't grow forever
+MAX_PROCESSED_ALERTS = 10_000
+processed_alerts: "OrderedDict[str, str]" = OrderedDict()
 
-@router.post("/{alert_id}/acknowledge")
-async def acknowledge_alert(alert_id: str):
-    """Mark alert as acknowledged"""
-    try:
-        processed_alerts.add(alert_id)
-        print(f"✓ Alert acknowledged: {alert_id}")
-        return {
-            "success": True,
-            "message": f"Alert {alert_id} acknowledged",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# Past-tense wording for each action, used in the response message
+_ACTION_PAST = {
+    "acknowledge": "acknowledged",
+    "dismiss": "dismissed",
+}
 
-@router.post("/{alert_id}/dismiss")
-async def dismiss_alert(alert_id: str):
-    """Mark alert as dismissed"""
-    try:
-        processed_alerts.add(alert_id)
-        print(f"✓ Alert dismissed: {alert_id}")
-        return {
-            "success": True,
-            "message": f"Alert {alert_id} dismissed",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# Response body with the fixed parts already serialized; only the message
+# (JSON-escaped, since alert_id comes from the URL) and timestamp are filled in
+_RESPONSE_TEMPLATE = b'{"success":true,"message":%s,"timestamp":"%s"}'
+
+@router.post("/{alert_id}/{action}")
+async def process_alert(alert_id: str, action: Literal["acknowledge", "dismiss"]):
+    """Mark alert as acknowledged or dismissed"""
+    past = _ACTION_PAST[action]
+
+    processed_alerts[alert_id] = past
+    processed_alerts.move_to_end(alert_id)
+    while len(processed_alerts) > MAX_PROCESSED_ALERTS:
+        processed_alerts.popitem(last=False)
+
+    logger.info("Alert %s: %s", past, alert_id)
+    body = _RESPONSE_TEMPLATE % (
+        orjson.dumps(f"Alert {alert_id} {past}"),
+        iso_now_cached().encode()
+    )
+    return Response(content=body, media_type="application/json")
@@ -1,31 +1,156 @@
 from fastapi import APIRouter, HTTPException
-from datetime import datetime
-import json
+from fastapi.responses import ORJSONResponse
+from services.clock import iso_now_cached
+import orjson
+import os
+import tempfile
+import threading
+import logging
+from collections import deque
 from pathlib import Path
 
 router = APIRouter(prefix="/api", tags=["history"])
+logger = logging.getLogger("meditrack.history")
 
 HISTORY_FILE = Path("data/upload_history.json")
 HISTORY_FILE.parent.mkdir(exist_ok=True)
 
+# Only the most recent uploads are kept
+MAX_HISTORY = 100
+
+# Parsed history and its aggregate counters, reused until the file's mtime changes
+# "data" is the list of records handed out to readers (never modified in
+# place), "by_video" maps video_id -> record
+_EMPTY_STATS = {"uploads": 0, "detections": 0, "alerts": 0, "critical": 0}
+_history_cache = {
+    "mtime": None,
+    "data": [],
+    "by_video": {},
+    "stats": _EMPTY_STATS
+}
+_history_lock = threading.Lock()
+
+def _compute_history_stats(history):
+    """Aggregate counters over all history records, in one pass."""
+    detections = alerts = critical = 0
+    for h in history:
+        detections += h.get("detections", 0)
+        record_alerts = h.get("alerts", 0)
+        alerts += record_alerts
+        if record_alerts > 0:
+            critical += 1
+    return {
+        "uploads": len(history),
+        "detections": detections,
+        "alerts": alerts,
+        "critical": critical
+    }
+
+def _remove_video(history, video_id):
+    """
+    Remove every record of video_id from the history deque in place.
+    Files written before records were kept unique may hold several.
+    """
+    kept = [h for h in history if h.get("video_id") != video_id]
+    history.clear()
+    history.extend(kept)
+
+def _index_by_video(history):
+    """Map video_id -> record; the most recent record wins."""
+    return {h.get("video_id"): h for h in reversed(history)}
+
+def _load_history_locked():
+    """load_history() for callers already holding _history_lock."""
+    try:
+        mtime = os.stat(HISTORY_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    
+    if _history_cache["mtime"] == mtime:
+        return _history_cache["data"]
+    
+    try:
+        # Records are stored most recent first, so keep the head
+        data = orjson.loads(HISTORY_FILE.read_bytes())[:MAX_HISTORY]
+    except Exception as e:
+        logger.error("Error loading history: %s", e)
+        return []
+    
+    _history_cache["mtime"] = mtime
+    _history_cache["data"] = data
+    _history_cache["by_video"] = _index_by_video(data)
+    _history_cache["stats"] = _compute_history_stats(data)
+    return data
+
 def load_history():
-    """Load upload history from JSON file."""
-    if HISTORY_FILE.exists():
-        try:
-            with open(HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading history: {e}")
-            return []
-    return []
+    """
+    Load upload history from JSON file.
+    The parsed list is cached and shared, so callers must not mutate it.
+    """
+    with _history_lock:
+        return _load_history_locked()
+
+def _update_history(change):
+    """
+    Read-modify-write of the history under _history_lock.
+    change(records, by_video) edits a copy of the records (a bounded deque,
+    most recent first) and returns False if there was nothing to change.
+    The cached history is only replaced once the new file is saved.
+    """
+    with _history_lock:
+        data = _load_history_locked()
+        by_video = _history_cache["by_video"] if data else {}
+        # appendleft() on a full deque drops the oldest record, at the right
+        records = deque(data[:MAX_HISTORY], maxlen=MAX_HISTORY)
+        if change(records, by_video) is not False:
+            _write_history_locked(records)
+
+def get_history_stats():
+    """
+    Totals over the upload history: uploads, detections, alerts and
+    critical (uploads with at least one alert).
+    Only recomputed when the history file changes.
+    """
+    if load_history():
+        return _history_cache["stats"]
+    return _EMPTY_STATS
+
+def _write_history_locked(history):
+    """
+    Write history to the JSON file and make it the cached history.
+    Must be called with _history_lock held; the cache is only replaced
+    once the new file is in place.
+    """
+    if not isinstance(history, deque):
+        # Most recent first; a deque built from the whole list would keep the tail
+        history = deque(list(history)[:MAX_HISTORY], maxlen=MAX_HISTORY)
+    data = list(history)
+    
+    # Write a temp file of our own and swap it in, so readers never see
+    # partial JSON and concurrent saves never share a temp file
+    tmp = tempfile.NamedTemporaryFile(
+        dir=HISTORY_FILE.parent, prefix=HISTORY_FILE.name, suffix=".tmp", delete=False
+    )
+    try:
+        with tmp:
+            tmp.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
+        os.replace(tmp.name, HISTORY_FILE)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    
+    _history_cache["mtime"] = os.stat(HISTORY_FILE).st_mtime_ns
+    _history_cache["data"] = data
+    _history_cache["by_video"] = _index_by_video(data)
+    _history_cache["stats"] = _compute_history_stats(data)
 
 def save_history(history):
     """Save upload history to JSON file."""
     try:
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(history, f, indent=2)
+        with _history_lock:
+            _write_history_locked(history)
     except Exception as e:
-        print(f"Error saving history: {e}")
+        logger.error("Error saving history: %s", e)
 
 @router.get("/history")
 async def get_history():
@@ -33,19 +158,52 @@ async def get_history():
     Get all upload history records.
     Returns records sorted by most recent first.
     """
+    history = load_history()
+    return ORJSONResponse({
+        "success": True,
+        "data": history,
+        "total": len(history)
+    })
+
+def add_history_entry(
+    video_id: str,
+    filename: str,
+    size: int,
+    detections: int,
+    alerts: int
+):
+    """
+    Record a processed upload in history and return the new record.
+    Called directly by the upload router, and by the /history/add endpoint.
+    """
+    new_record = {
+        "id": video_id,
+        "video_id": video_id,
+        "filename": filename,
+        "size": size,
+        "detections": detections,
+        "alerts": alerts,
+        "timestamp": iso_now_cached(),
+        "status": "completed"
+    }
+    
+    def add(history, by_video):
+        # One record per video: a re-added video replaces its old records
+        if video_id in by_video:
+            _remove_video(history, video_id)
+        
+        # Add to front (most recent first), the deque drops the oldest
+        # record once it holds MAX_HISTORY
+        history.appendleft(new_record)
+    
     try:
-        history = load_history()
-        return {
-            "success": True,
-            "data": history,
-            "total": len(history)
-        }
+        _update_history(add)
     except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "data": []
-        }
+        logger.error("Error saving history: %s", e)
+    
+    logger.info("Added to history: %s", filename)
+    
+    return new_record
 
 @router.post("/history/add")
 async def add_history_record(
@@ -59,71 +217,38 @@ async def add_history_record(
     Add a new video upload to history.
     Called after video is processed successfully.
     """
-    try:
-        history = load_history()
-        
-        new_record = {
-            "id": video_id,
-            "video_id": video_id,
-            "filename": filename,
-            "size": size,
-            "detections": detections,
-            "alerts": alerts,
-            "timestamp": datetime.now().isoformat(),
-            "status": "completed"
-        }
-        
-        # Add to front (most recent first)
-        history.insert(0, new_record)
-        
-        # Keep last 100 records
-        history = history[:100]
-        
-        save_history(history)
-        
-        print(f"✅ Added to history: {filename}")
-        
-        return {
-            "success": True,
-            "message": "Successfully added to history",
-            "record": new_record
-        }
-    except Exception as e:
-        print(f"❌ Error adding to history: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    new_record = add_history_entry(video_id, filename, size, detections, alerts)
+    
+    return ORJSONResponse({
+        "success": True,
+        "message": "Successfully added to history",
+        "record": new_record
+    })
 
 @router.delete("/history/{video_id}")
 async def delete_history_record(video_id: str):
-    """Delete a specific record from history."""
+    """Delete every history record of a video."""
+    def delete(history, by_video):
+        # Unknown videos leave the file untouched
+        if video_id not in by_video:
+            return False
+        _remove_video(history, video_id)
+    
     try:
-        history = load_history()
-        history = [h for h in history if h.get("video_id") != video_id]
-        save_history(history)
-        
-        return {
-            "success": True,
-            "message": "Record deleted"
-        }
+        _update_history(delete)
     except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+        logger.error("Error saving history: %s", e)
+    
+    return ORJSONResponse({
+        "success": True,
+        "message": "Record deleted"
+    })
 
 @router.delete("/history")
 async def clear_history():
     """Clear all history records."""
-    try:
-        save_history([])
-        return {
-            "success": True,
-            "message": "History cleared"
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
\ No newline at end of file
+    save_history([])
+    return ORJSONResponse({
+        "success": True,
+        "message": "History cleared"
+    })
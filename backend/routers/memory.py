@@ -3,11 +3,12 @@ Memory API endpoints.
 Allows frontend to interact with the memory system.
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from datetime import datetime, timedelta
-from typing import Optional, List
-import json
-from pathlib import Path
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+from services.clock import iso_now_cached
+
+# Upload history is shared with the history router (and its cache)
+from routers.history import load_history, get_history_stats
 
 # Create router
 router = APIRouter(
@@ -15,19 +16,6 @@ router = APIRouter(
     tags=["memory"]
 )
 
-# Path to history file
-HISTORY_FILE = Path("data/upload_history.json")
-
-def load_history():
-    """Load upload history from JSON file."""
-    if HISTORY_FILE.exists():
-        try:
-            with open(HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return []
-    return []
-
 # ===== STATISTICS ENDPOINT =====
 
 @router.get("/stats")
@@ -58,46 +46,23 @@ async def get_memory_stats():
             }
         }
     """
-    try:
-        history = load_history()
-        
-        if not history:
-            return {
-                "success": True,
-                "data": {
-                    "total_uploads": 0,
-                    "total_detections": 0,
-                    "total_alerts": 0,
-                    "average_detections_per_video": 0,
-                    "critical_sessions": 0,
-                    "timestamp": datetime.now().isoformat()
-                }
-            }
-        
-        total_detections = sum(h.get("detections", 0) for h in history)
-        total_alerts = sum(h.get("alerts", 0) for h in history)
-        critical_sessions = sum(1 for h in history if h.get("alerts", 0) > 0)
-        
-        stats = {
-            "success": True,
-            "data": {
-                "total_uploads": len(history),
-                "total_detections": total_detections,
-                "total_alerts": total_alerts,
-                "average_detections_per_video": round(total_detections / len(history), 2) if history else 0,
-                "critical_sessions": critical_sessions,
-                "timestamp": datetime.now().isoformat()
-            }
-        }
-        
-        return stats
-        
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "data": {}
+    # Counters are maintained by the history cache, not summed per request
+    totals = get_history_stats()
+    uploads = totals["uploads"]
+    
+    stats = {
+        "success": True,
+        "data": {
+            "total_uploads": uploads,
+            "total_detections": totals["detections"],
+            "total_alerts": totals["alerts"],
+            "average_detections_per_video": round(totals["detections"] / uploads, 2) if uploads else 0,
+            "critical_sessions": totals["critical"],
+            "timestamp": iso_now_cached()
         }
+    }
+    
+    return ORJSONResponse(stats)
 
 # ===== HEALTH CHECK =====
 
@@ -120,22 +85,14 @@ async def memory_health_check():
             "timestamp": "2025-10-27T12:42:00"
         }
     """
-    try:
-        history = load_history()
-        
-        return {
-            "status": "healthy",
-            "system_initialized": True,
-            "total_uploads": len(history),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e),
-            "timestamp": datetime.now().isoformat()
-        }
+    history = load_history()
+    
+    return ORJSONResponse({
+        "status": "healthy",
+        "system_initialized": True,
+        "total_uploads": len(history),
+        "timestamp": iso_now_cached()
+    })
 
 # ===== ADDITIONAL UTILITY ENDPOINTS =====
 
@@ -157,28 +114,21 @@ async def get_upload_summary():
             "equipment_distribution": {...}
         }
     """
-    try:
-        history = load_history()
-        
-        # Get equipment distribution
-        equipment_dist = {}
-        for upload in history:
-            detections = upload.get("detections", 0)
-            if detections > 0:
-                # Group by detection count ranges
-                key = f"{detections} items"
-                equipment_dist[key] = equipment_dist.get(key, 0) + 1
-        
-        return {
-            "success": True,
-            "total_uploads": len(history),
-            "recent_uploads": history[:10],  # Last 10
-            "equipment_distribution": equipment_dist,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
\ No newline at end of file
+    history = load_history()
+    
+    # Get equipment distribution
+    equipment_dist = {}
+    for upload in history:
+        detections = upload.get("detections", 0)
+        if detections > 0:
+            # Group by detection count ranges
+            key = f"{detections} items"
+            equipment_dist[key] = equipment_dist.get(key, 0) + 1
+    
+    return ORJSONResponse({
+        "success": True,
+        "total_uploads": len(history),
+        "recent_uploads": history[:10],  # Last 10
+        "equipment_distribution": equipment_dist,
+        "timestamp": iso_now_cached()
+    })
@@ -3,32 +3,84 @@ Tracking API endpoints.
 Provides equipment identity resolution and track management.
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
 from datetime import datetime
-from typing import List, Optional, Dict
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Dict, Literal, Tuple
 from pydantic import BaseModel
-import json
-from pathlib import Path
+import time
+import logging
+import orjson
 
-from services.tracking_service import TrackingService
+from routers import alerts
+from services.clock import parse_iso_timestamp
+
+if TYPE_CHECKING:
+    from services.tracking_service import TrackingService
 
 
 router = APIRouter(
     prefix="/api/track",
     tags=["tracking"]
 )
+logger = logging.getLogger("meditrack.tracking")
+
+
+@lru_cache(maxsize=1)
+def get_tracking_service() -> "TrackingService":
+    """Get or initialize the shared tracking service."""
+    # Imported here so numpy/scipy/networkx load on first use, not at import
+    from services.tracking_service import TrackingService
+    
+    service = TrackingService()
+    service.load_topology()
+    return service
+
+
+async def tracking_service() -> "TrackingService":
+    """
+    Endpoint dependency for the shared tracking service.
+    Async so FastAPI calls it inline rather than in the threadpool.
+    """
+    return get_tracking_service()
+
+
+# ===== RESPONSE CACHE =====
+
+# Serialized bodies of read-mostly GET endpoints: key -> (expires_at, body)
+# Topology only changes on restart; analytics is dropped whenever tracks change
+RESPONSE_TTL_SECONDS = {
+    "topology": 3600,
+    "analytics": 60,
+}
+_response_cache: Dict[str, Tuple[float, bytes]] = {}
+
+
+def _cached_response(key: str) -> Optional[Response]:
+    """Return the cached response for key, or None if missing or expired."""
+    entry = _response_cache.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return Response(content=entry[1], media_type="application/json")
+    return None
+
+
+def _cache_response(key: str, payload: Dict) -> Response:
+    """Serialize payload once, cache the bytes and return them as a response."""
+    # Tracks carry numpy floats from the association math
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    _response_cache[key] = (time.monotonic() + RESPONSE_TTL_SECONDS[key], body)
+    return Response(content=body, media_type="application/json")
+
 
-# Initialize tracking service
-tracking_service = None
+def _invalidate_track_responses():
+    """Drop cached responses that are derived from tracks."""
+    _response_cache.pop("analytics", None)
 
 
-def get_tracking_service():
-    """Get or initialize tracking service."""
-    global tracking_service
-    if tracking_service is None:
-        tracking_service = TrackingService()
-        tracking_service.load_topology()
-    return tracking_service
+# Above this many tracks, analytics computes confidence stats with numpy;
+# below it the array setup costs more than a plain loop
+NUMPY_KPI_MIN_TRACKS = 256
 
 
 # ===== REQUEST/RESPONSE MODELS =====
@@ -67,93 +119,113 @@ class TrackResponse(BaseModel):
 # ===== ENDPOINTS =====
 
 
-@router.post("/associate", response_model=TrackResponse)
-async def associate_detections(request: AssociateRequest):
+# The endpoint returns an ORJSONResponse directly, skipping validation and
+# jsonable_encoder; responses= keeps TrackResponse in the OpenAPI docs
+@router.post(
+    "/associate",
+    response_model=None,
+    responses={200: {"model": TrackResponse}}
+)
+async def associate_detections(
+    request: AssociateRequest,
+    background: BackgroundTasks,
+    service: "TrackingService" = Depends(tracking_service)
+):
     """
     Associate equipment detections into identity chains.
     """
-    try:
-        service = get_tracking_service()
-        
-        print(f"\n--- ASSOCIATE REQUEST ---")
-        print(f"Total detections: {len(request.detections)}")
-        print(f"Surge mode: {request.surge}")
-        
-        # Convert timestamp strings to datetime
-        for det in request.detections:
-            try:
-                if isinstance(det['ts'], str):
-                    print(f"Converting timestamp: {det['ts']}")
-                    det['ts'] = datetime.fromisoformat(det['ts'].replace('Z', '+00:00'))
-                print(f"Detection {det['det_id']}: node={det['node_id']}, class={det['class']}, ts={det['ts']}")
-            except Exception as e:
-                print(f"ERROR parsing detection {det.get('det_id')}: {e}")
-                raise
-        
-        print(f"Starting association...")
-        # Associate detections
-        tracks = service.associate_detections(request.detections)
-        
-        print(f"Tracks formed: {len(tracks)}")
+    debug = logger.isEnabledFor(logging.DEBUG)
+    logger.debug(
+        "Associate request: %d detections, surge=%s",
+        len(request.detections), request.surge
+    )
+    
+    # Convert timestamp strings to datetime
+    for det in request.detections:
+        try:
+            if isinstance(det['ts'], str):
+                det['ts'] = parse_iso_timestamp(det['ts'])
+            if debug:
+                logger.debug(
+                    "Detection %s: node=%s, class=%s, ts=%s",
+                    det['det_id'], det['node_id'], det['class'], det['ts']
+                )
+        except Exception as e:
+            logger.error("Error parsing detection %s: %s", det.get('det_id'), e)
+            raise
+    
+    # Associate detections
+    tracks = service.associate_detections(request.detections)
+    
+    logger.debug("Tracks formed: %d", len(tracks))
+    if debug:
         for track in tracks:
-            print(f"  Track {track['track_id']}: {len(track['links'])} links, confidence={track['confidence']}")
-        
-        # Save tracks
-        service.save_tracks(tracks)
-        
-        # Compute statistics
-        stats = {
-            "total_detections": len(request.detections),
-            "tracks_formed": len(tracks),
-            "high_confidence": len([t for t in tracks if t['confidence'] > 0.85]),
-            "medium_confidence": len([t for t in tracks if 0.5 < t['confidence'] <= 0.85]),
-            "needs_review": len([t for t in tracks if t['status'] == 'needs_review']),
-            "avg_confidence": round(sum(t['confidence'] for t in tracks) / len(tracks), 3) if tracks else 0
-        }
-        
-        return TrackResponse(
-            success=True,
-            tracks=tracks,
-            stats=stats,
-            timestamp=datetime.now().isoformat()
-        )
+            logger.debug(
+                "Track %s: %d links, confidence=%s",
+                track['track_id'], len(track['links']), track['confidence']
+            )
+    
+    # Tracks are served from memory right away; the database write
+    # runs after the response is sent
+    generation = service.set_tracks(tracks)
+    background.add_task(service.write_tracks, generation)
+    _invalidate_track_responses()
     
-    except Exception as e:
-        print(f"\n!!! ASSOCIATION ERROR !!!")
-        print(f"Error type: {type(e)}")
-        print(f"Error message: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        print(f"!!! END ERROR !!!\n")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Compute statistics (one pass over the tracks)
+    high = medium = needs_review = 0
+    conf_sum = 0.0
+    for t in tracks:
+        c = t['confidence']
+        conf_sum += c
+        if c > 0.85:
+            high += 1
+        elif c > 0.5:
+            medium += 1
+        if t['status'] == 'needs_review':
+            needs_review += 1
+    
+    stats = {
+        "total_detections": len(request.detections),
+        "tracks_formed": len(tracks),
+        "high_confidence": high,
+        "medium_confidence": medium,
+        "needs_review": needs_review,
+        "avg_confidence": round(conf_sum / len(tracks), 3) if tracks else 0
+    }
+    
+    # Same shape as TrackResponse, encoded straight by orjson
+    return ORJSONResponse({
+        "success": True,
+        "tracks": tracks,
+        "stats": stats,
+        "timestamp": datetime.now()
+    })
 
 
 
 @router.get("/tracks")
-async def get_all_tracks():
+async def get_all_tracks(service: "TrackingService" = Depends(tracking_service)):
     """
     Get all stored tracks.
     
     Returns:
         List of all equipment tracks with full details
     """
-    try:
-        service = get_tracking_service()
-        tracks = service.load_tracks()
-        
-        return {
-            "success": True,
-            "total_tracks": len(tracks),
-            "tracks": tracks,
-            "timestamp": datetime.now().isoformat()
-        }
+    tracks = service.load_tracks()
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return ORJSONResponse({
+        "success": True,
+        "total_tracks": len(tracks),
+        "tracks": tracks,
+        "timestamp": datetime.now()
+    })
 
 
 @router.get("/tracks/{track_id}")
-async def get_track(track_id: str):
+async def get_track(
+    track_id: str,
+    service: "TrackingService" = Depends(tracking_service)
+):
     """
     Get details for a specific track.
     
@@ -163,72 +235,65 @@ async def get_track(track_id: str):
     Returns:
         Full track details including all links and reasoning
     """
-    try:
-        service = get_tracking_service()
-        tracks = service.load_tracks()
-        
-        track = next((t for t in tracks if t['track_id'] == track_id), None)
-        
-        if not track:
-            raise HTTPException(status_code=404, detail="Track not found")
-        
-        return {
-            "success": True,
-            "track": track,
-            "timestamp": datetime.now().isoformat()
-        }
+    track = service.get_track(track_id)
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    
+    return ORJSONResponse({
+        "success": True,
+        "track": track,
+        "timestamp": datetime.now()
+    })
 
 
 @router.get("/topology")
-async def get_topology():
+async def get_topology(service: "TrackingService" = Depends(tracking_service)):
     """
     Get current topology configuration.
     
     Returns:
         Nodes, edges, and distances for visualization/debugging
     """
-    try:
-        service = get_tracking_service()
-        
-        # Build readable node/edge data
-        nodes_data = [
-            {
-                "id": n['id'],
-                "name": n['name'],
-                "type": n['type']
-            }
-            for n in service.nodes
-        ]
-        
-        edges_data = [
-            {
-                "from_id": e['from'],
-                "from_name": service.get_node_name(e['from']),
-                "to_id": e['to'],
-                "to_name": service.get_node_name(e['to']),
-                "distance_m": e['distance_m']
-            }
-            for e in service.edges
-        ]
-        
-        return {
-            "success": True,
-            "nodes": nodes_data,
-            "edges": edges_data,
-            "timestamp": datetime.now().isoformat()
+    cached = _cached_response("topology")
+    if cached is not None:
+        return cached
+    
+    # Build readable node/edge data
+    nodes_data = [
+        {
+            "id": n['id'],
+            "name": n['name'],
+            "type": n['type']
+        }
+        for n in service.nodes
+    ]
+    
+    edges_data = [
+        {
+            "from_id": e['from'],
+            "from_name": service.get_node_name(e['from']),
+            "to_id": e['to'],
+            "to_name": service.get_node_name(e['to']),
+            "distance_m": e['distance_m']
         }
+        for e in service.edges
+    ]
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _cache_response("topology", {
+        "success": True,
+        "nodes": nodes_data,
+        "edges": edges_data,
+        "timestamp": datetime.now()
+    })
 
 
 @router.post("/reconcile/{track_id}")
-async def reconcile_track(track_id: str, action: str = Query(...)):
+async def reconcile_track(
+    track_id: str,
+    action: str = Query(...),
+    service: "TrackingService" = Depends(tracking_service)
+):
     """
     Manual reconciliation of a track.
     
@@ -239,146 +304,116 @@ async def reconcile_track(track_id: str, action: str = Query(...)):
     Returns:
         Updated track status
     """
-    try:
-        if action not in ['confirm', 'flag', 'delete']:
-            raise HTTPException(status_code=400, detail="Invalid action")
-        
-        service = get_tracking_service()
-        tracks = service.load_tracks()
-        
-        track = next((t for t in tracks if t['track_id'] == track_id), None)
-        
-        if not track:
-            raise HTTPException(status_code=404, detail="Track not found")
-        
-        if action == 'confirm':
-            track['status'] = 'confirmed'
-        elif action == 'flag':
-            track['status'] = 'needs_review'
-        elif action == 'delete':
-            tracks = [t for t in tracks if t['track_id'] != track_id]
-        
-        service.save_tracks(tracks)
-        
-        return {
-            "success": True,
-            "message": f"Track {action}ed successfully",
-            "track": track if action != 'delete' else None,
-            "timestamp": datetime.now().isoformat()
-        }
+    if action not in ['confirm', 'flag', 'delete']:
+        raise HTTPException(status_code=400, detail="Invalid action")
+    
+    track = service.get_track(track_id)
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    
+    # Only the one affected row is written
+    if action == 'confirm':
+        track['status'] = 'confirmed'
+        service.update_track(track)
+    elif action == 'flag':
+        track['status'] = 'needs_review'
+        service.update_track(track)
+    elif action == 'delete':
+        service.delete_track(track_id)
+    
+    _invalidate_track_responses()
+    
+    return ORJSONResponse({
+        "success": True,
+        "message": f"Track {action}ed successfully",
+        "track": track if action != 'delete' else None,
+        "timestamp": datetime.now()
+    })
 
 
 @router.get("/analytics")
-async def get_tracking_analytics():
+async def get_tracking_analytics(service: "TrackingService" = Depends(tracking_service)):
     """
     Get tracking system analytics and metrics.
     
     Returns:
         KPIs including track counts, confidences, and performance metrics
     """
-    try:
-        service = get_tracking_service()
-        tracks = service.load_tracks()
-        
-        if not tracks:
-            return {
-                "success": True,
-                "kpis": {
-                    "total_tracks": 0,
-                    "avg_confidence": 0,
-                    "high_confidence_count": 0,
-                    "needs_review_count": 0,
-                    "avg_links_per_track": 0
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-        
-        confidences = [t['confidence'] for t in tracks]
-        link_counts = [len(t.get('links', [])) for t in tracks]
-        
-        kpis = {
-            "total_tracks": len(tracks),
-            "avg_confidence": round(sum(confidences) / len(confidences), 3),
-            "min_confidence": round(min(confidences), 3),
-            "max_confidence": round(max(confidences), 3),
-            "high_confidence_count": len([c for c in confidences if c > 0.85]),
-            "medium_confidence_count": len([c for c in confidences if 0.5 < c <= 0.85]),
-            "low_confidence_count": len([c for c in confidences if c <= 0.5]),
-            "needs_review_count": len([t for t in tracks if t['status'] == 'needs_review']),
-            "avg_links_per_track": round(sum(link_counts) / len(link_counts), 2) if link_counts else 0
-        }
-        
-        return {
+    cached = _cached_response("analytics")
+    if cached is not None:
+        return cached
+    
+    tracks = service.load_tracks()
+    
+    if not tracks:
+        return _cache_response("analytics", {
             "success": True,
-            "kpis": kpis,
-            "timestamp": datetime.now().isoformat()
-        }
+            "kpis": {
+                "total_tracks": 0,
+                "avg_confidence": 0,
+                "high_confidence_count": 0,
+                "needs_review_count": 0,
+                "avg_links_per_track": 0
+            },
+            "timestamp": datetime.now()
+        })
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@router.post("/alerts/{alert_id}/acknowledge")
-async def acknowledge_alert(alert_id: str):
-    """Mark alert as acknowledged"""
-    print(f"✓ Alert acknowledged: {alert_id}")
-    return {
-        "success": True,
-        "message": f"Alert {alert_id} acknowledged",
-        "timestamp": datetime.now().isoformat()
+    n = len(tracks)
+    if n > NUMPY_KPI_MIN_TRACKS:
+        # Confidence stats vectorized; numpy is already loaded by the service
+        import numpy as np
+        conf = np.fromiter((t['confidence'] for t in tracks), dtype=np.float64, count=n)
+        conf_sum = float(conf.sum())
+        conf_min = float(conf.min())
+        conf_max = float(conf.max())
+        high = int(np.count_nonzero(conf > 0.85))
+        medium = int(np.count_nonzero(conf > 0.5)) - high
+        low = n - high - medium
+        needs_review = sum(1 for t in tracks if t['status'] == 'needs_review')
+        links_sum = sum(len(t.get('links', ())) for t in tracks)
+    else:
+        # All KPIs in a single pass over the tracks
+        conf_sum = 0.0
+        conf_min = float("inf")
+        conf_max = float("-inf")
+        high = medium = low = needs_review = links_sum = 0
+        for t in tracks:
+            c = t['confidence']
+            conf_sum += c
+            if c < conf_min:
+                conf_min = c
+            if c > conf_max:
+                conf_max = c
+            if c > 0.85:
+                high += 1
+            elif c > 0.5:
+                medium += 1
+            else:
+                low += 1
+            if t['status'] == 'needs_review':
+                needs_review += 1
+            links_sum += len(t.get('links', ()))
+    
+    kpis = {
+        "total_tracks": n,
+        "avg_confidence": round(conf_sum / n, 3),
+        "min_confidence": round(conf_min, 3),
+        "max_confidence": round(conf_max, 3),
+        "high_confidence_count": high,
+        "medium_confidence_count": medium,
+        "low_confidence_count": low,
+        "needs_review_count": needs_review,
+        "avg_links_per_track": round(links_sum / n, 2)
     }
-
-@router.post("/alerts/{alert_id}/dismiss")
-async def dismiss_alert(alert_id: str):
-    """Mark alert as dismissed"""
-    print(f"✓ Alert dismissed: {alert_id}")
-    return {
+    
+    return _cache_response("analytics", {
         "success": True,
-        "message": f"Alert {alert_id} dismissed",
-        "timestamp": datetime.now().isoformat()
-    }
+        "kpis": kpis,
+        "timestamp": datetime.now()
+    })
 
-@router.get("/topology")
-async def get_topology():
-    """Get hospital topology (nodes and edges)"""
-    try:
-        service = get_tracking_service()
-        
-        # Get nodes with computed positions
-        nodes = []
-        for node in service.nodes:
-            nodes.append({
-                "id": node["id"],
-                "name": node["name"],
-                "type": "room",
-                "x": 100 + node["id"] * 150,
-                "y": 150 + (node["id"] % 2) * 200
-            })
-        
-        # Get edges
-        edges = []
-        for edge in service.edges:
-            edges.append({
-                "from": edge["from"],
-                "to": edge["to"],
-                "distance": edge["distance"]
-            })
-        
-        print(f"Returning topology: {len(nodes)} nodes, {len(edges)} edges")
-        
-        return {
-            "success": True,
-            "topology": {
-                "nodes": nodes,
-                "edges": edges
-            }
-        }
-    except Exception as e:
-        print(f"Topology error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+@router.post("/alerts/{alert_id}/{action}")
+async def process_alert(alert_id: str, action: Literal["acknowledge", "dismiss"]):
+    """Mark alert as acknowledged or dismissed (same handler as /api/alerts)"""
+    return await alerts.process_alert(alert_id, action)
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, BackgroundTasks
 from fastapi.responses import JSONResponse
 import uuid
 import os
+import logging
+import anyio
 from services.memories_ai_client import MemoriesAPIClient
-import httpx
+from routers.history import add_history_entry
 
 router = APIRouter(prefix="/api", tags=["upload"])
+logger = logging.getLogger("meditrack.upload")
 
 # Initialize services
 memories_client = MemoriesAPIClient()
@@ -13,8 +16,18 @@ memories_client = MemoriesAPIClient()
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Uploads are copied to disk in chunks of this size, never held whole in memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _save_to_history(**record):
+    """Background task: record the upload in history, logging failures."""
+    try:
+        add_history_entry(**record)
+    except Exception as e:
+        logger.warning("Failed to save to history: %.100s", e)
+
 @router.post("/upload")
-async def upload_video(file: UploadFile = File(...)):
+async def upload_video(background: BackgroundTasks, file: UploadFile = File(...)):
     """
     Upload and process a video file.
     Returns detected equipment, alerts, and saves to history.
@@ -22,51 +35,49 @@ async def upload_video(file: UploadFile = File(...)):
     upload_id = str(uuid.uuid4())
     
     try:
-        print(f"\n📹 Processing video upload: {upload_id}")
-        print(f"   File: {file.filename}")
-        
-        # Read file
-        contents = await file.read()
-        file_size_mb = len(contents) / 1024 / 1024
-        file_size_bytes = len(contents)
+        logger.info("Processing video upload %s: %s", upload_id, file.filename)
         
-        print(f"   Size: {file_size_mb:.2f} MB")
-        
-        # Analyze video with Memories.ai
-        print(f"\n🔌 Using Memories.ai API")
-        detections = await memories_client.analyze_video_correct(contents)
+        # Stream the upload to a temp file; the client uploads it from there.
+        # The file is removed however the copy or the analysis ends
+        video_path = os.path.join(UPLOAD_DIR, f"{upload_id}.upload")
+        try:
+            with open(video_path, "wb") as out:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    # Disk writes run in a worker thread, off the event loop
+                    await anyio.to_thread.run_sync(out.write, chunk)
+            file_size_bytes = os.stat(video_path).st_size
+            file_size_mb = file_size_bytes / 1024 / 1024
+            
+            logger.debug("Upload %s size: %.2f MB", upload_id, file_size_mb)
+            
+            # Analyze video with Memories.ai
+            detections = await memories_client.analyze_video_correct(video_path)
+        finally:
+            try:
+                os.remove(video_path)
+            except FileNotFoundError:
+                pass
         
-        print(f"   Equipment identified: {len(detections)} items")
+        logger.debug("Equipment identified: %d items", len(detections))
         
         # Count alerts
         alerts_count = sum(1 for d in detections if d.get("alert"))
         
-        print(f"   Alerts: {alerts_count} critical")
+        logger.debug("Alerts: %d critical", alerts_count)
         
         # ✅ SAVE TO HISTORY
-        try:
-            async with httpx.AsyncClient() as client:
-                history_response = await client.post(
-                    "http://localhost:8000/api/history/add",
-                    params={
-                        "video_id": upload_id,
-                        "filename": file.filename,
-                        "size": file_size_bytes,
-                        "detections": len(detections),
-                        "alerts": alerts_count
-                    },
-                    timeout=10.0
-                )
-                
-                if history_response.status_code == 200:
-                    print("✅ Saved to history")
-                else:
-                    print(f"⚠️ History save returned: {history_response.status_code}")
-                    
-        except Exception as e:
-            print(f"⚠️ Failed to save to history: {str(e)[:100]}")
+        # Same app, so call the history code directly instead of over HTTP,
+        # after the response has been sent
+        background.add_task(
+            _save_to_history,
+            video_id=upload_id,
+            filename=file.filename,
+            size=file_size_bytes,
+            detections=len(detections),
+            alerts=alerts_count
+        )
         
-        print(f"✅ Upload processed successfully")
+        logger.info("Upload %s processed successfully", upload_id)
         
         # Return response
         return JSONResponse({
@@ -82,7 +93,7 @@ async def upload_video(file: UploadFile = File(...)):
         })
         
     except Exception as e:
-        print(f"❌ Error processing upload: {str(e)}")
+        logger.error("Error processing upload %s: %s", upload_id, e)
         return JSONResponse(
             status_code=500,
             content={
@@ -0,0 +1,45 @@
+"""
+Timestamp helpers.
+Endpoints that stamp responses with the current time share one ISO
+string per second instead of formatting a new one on every request.
+Incoming ISO timestamps are parsed with ciso8601 when it is installed.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+import time
+
+try:
+    # C parser, handles a trailing "Z" natively
+    from ciso8601 import parse_datetime as _parse_iso
+except ImportError:
+    # Python 3.11+ fromisoformat also accepts "Z"
+    _parse_iso = datetime.fromisoformat
+
+
+@lru_cache(maxsize=1)
+def _iso_for_second(second: int) -> str:
+    """ISO timestamp for a whole second."""
+    return datetime.fromtimestamp(second).isoformat()
+
+
+def iso_now_cached() -> str:
+    """
+    Current local time as an ISO string, at one-second resolution.
+    
+    Example:
+        iso_now_cached()
+        → "2025-10-27T12:42:00"
+    """
+    return _iso_for_second(int(time.time()))
+
+
+def parse_iso_timestamp(value: str) -> datetime:
+    """
+    Parse an ISO 8601 timestamp such as "2025-11-04T12:05:00Z".
+    
+    Example:
+        parse_iso_timestamp("2025-11-04T12:05:00Z")
+        → datetime(2025, 11, 4, 12, 5, tzinfo=timezone.utc)
+    """
+    return _parse_iso(value)
@@ -4,17 +4,31 @@ Loads and processes datasets for video processing.
 """
 
 from datasets import load_dataset
-from typing import Dict, List, Any, Optional
+from itertools import islice
+from typing import Dict, List, Any, Optional, Iterator
 import os
+import logging
+
+logger = logging.getLogger("meditrack.dataset")
 
 
 class DatasetLoader:
-    """Loader for Hugging Face datasets."""
+    """
+    Loader for Hugging Face datasets.
+    
+    Streams by default: samples are fetched as they are first asked for,
+    instead of downloading the whole dataset up front.
+    """
     
-    def __init__(self, dataset_name: str = "connectthapa84/OpenBiomedVid"):
+    def __init__(self, dataset_name: str = "connectthapa84/OpenBiomedVid", streaming: bool = True):
         self.dataset_name = dataset_name
+        self.streaming = streaming
         self.dataset = None
         
+        # Samples already read from each split, and the iterator to read more
+        self._prefix_cache: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        self._iterators: Dict[Optional[str], Iterator] = {}
+        
     def load(self, split: Optional[str] = None) -> Dict:
         """
         Load the dataset from Hugging Face.
@@ -23,39 +37,38 @@ class DatasetLoader:
             split: Dataset split to load (e.g., 'train', 'test', 'validation')
         
         Returns:
-            Dataset object
+            Dataset object (iterable when streaming)
         """
-        print(f"📦 Loading dataset: {self.dataset_name}")
+        logger.info("Loading dataset: %s", self.dataset_name)
         
         try:
             if split:
-                self.dataset = load_dataset(self.dataset_name, split=split)
+                self.dataset = load_dataset(self.dataset_name, split=split, streaming=self.streaming)
             else:
-                self.dataset = load_dataset(self.dataset_name)
+                self.dataset = load_dataset(self.dataset_name, streaming=self.streaming)
+            self._prefix_cache = {}
+            self._iterators = {}
             
-            print(f"✅ Dataset loaded successfully")
-            if hasattr(self.dataset, '__len__'):
-                print(f"   Samples: {len(self.dataset)}")
+            logger.info("Dataset loaded successfully")
+            if hasattr(self.dataset, '__len__') and not isinstance(self.dataset, dict):
+                logger.debug("Samples: %d", len(self.dataset))
             elif isinstance(self.dataset, dict):
                 for split_name, split_data in self.dataset.items():
-                    print(f"   {split_name}: {len(split_data)} samples")
+                    if hasattr(split_data, '__len__'):
+                        logger.debug("%s: %d samples", split_name, len(split_data))
+                    else:
+                        logger.debug("%s: streaming", split_name)
             
             return self.dataset
             
         except Exception as e:
-            print(f"❌ Error loading dataset: {e}")
+            logger.error("Error loading dataset: %s", e)
             raise
     
-    def get_sample(self, index: int = 0, split: Optional[str] = None) -> Dict[str, Any]:
+    def _take(self, count: int, split: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Get a single sample from the dataset.
-        
-        Args:
-            index: Sample index
-            split: Dataset split to use
-        
-        Returns:
-            Sample dictionary
+        First `count` samples of a split (fewer if the split is shorter).
+        Samples read once are kept, so repeated lookups don't re-stream.
         """
         if self.dataset is None:
             self.load(split=split)
@@ -63,16 +76,39 @@ class DatasetLoader:
         if isinstance(self.dataset, dict):
             # If dataset has multiple splits, use first split or specified split
             if split and split in self.dataset:
-                data = self.dataset[split]
+                key = split
             else:
-                data = list(self.dataset.values())[0]
+                key = next(iter(self.dataset))
+            data = self.dataset[key]
         else:
+            key = None
             data = self.dataset
         
-        if index >= len(data):
-            raise IndexError(f"Index {index} out of range for dataset of size {len(data)}")
+        cached = self._prefix_cache.setdefault(key, [])
+        if len(cached) < count:
+            iterator = self._iterators.get(key)
+            if iterator is None:
+                iterator = self._iterators[key] = iter(data)
+            cached.extend(islice(iterator, count - len(cached)))
+        return cached[:count]
+    
+    def get_sample(self, index: int = 0, split: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get a single sample from the dataset.
+        
+        Args:
+            index: Sample index
+            split: Dataset split to use
         
-        return data[index]
+        Returns:
+            Sample dictionary
+        """
+        samples = self._take(index + 1, split)
+        
+        if index >= len(samples):
+            raise IndexError(f"Index {index} out of range for dataset of size {len(samples)}")
+        
+        return samples[index]
     
     def get_video_samples(self, num_samples: int = 10, split: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -85,19 +121,7 @@ class DatasetLoader:
         Returns:
             List of sample dictionaries
         """
-        if self.dataset is None:
-            self.load(split=split)
-        
-        if isinstance(self.dataset, dict):
-            if split and split in self.dataset:
-                data = self.dataset[split]
-            else:
-                data = list(self.dataset.values())[0]
-        else:
-            data = self.dataset
-        
-        max_samples = min(num_samples, len(data))
-        return [data[i] for i in range(max_samples)]
+        return self._take(num_samples, split)
 
 
 # Example usage:
@@ -4,15 +4,201 @@ Handles video upload and object detection using Memories.ai API.
 """
 
 import os
+import re
+import hashlib
+import logging
 import aiohttp
 import asyncio
+import random
+import orjson
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional,List, Dict, Any
+from typing import Optional,List, Dict, Any, Union, Callable, Awaitable
+
+logger = logging.getLogger("meditrack.memories")
+
+# A video is either its raw bytes or the path of a file holding it;
+# paths are streamed to the API instead of being loaded into memory
+VideoSource = Union[bytes, str, os.PathLike]
+
+
+def _video_size(video: VideoSource) -> int:
+    """Size of a video in bytes, without reading a file into memory."""
+    if isinstance(video, (bytes, bytearray)):
+        return len(video)
+    return os.path.getsize(video)
+
+
+# Most results kept per cache; a processed video's summary and search
+# results don't change, so they are reused until evicted (oldest first)
+MAX_CACHED_RESULTS = 256
+
+
+# Most uploaded videos remembered by content digest
+MAX_CACHED_UPLOADS = 128
+
+# Files are hashed in blocks of this size, never read whole into memory
+DIGEST_BLOCK_BYTES = 1024 * 1024
+
+
+def _remember(cache: OrderedDict, key, value, limit: int = MAX_CACHED_RESULTS):
+    """Store value in a bounded LRU cache, evicting the oldest entries."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def _video_digest(video: VideoSource) -> bytes:
+    """
+    Digest of a video's full content, used to skip re-uploading identical
+    bytes. Reads the whole file, so call it from a worker thread.
+    """
+    if isinstance(video, (bytes, bytearray)):
+        return hashlib.blake2b(video, digest_size=16).digest()
+    
+    digest = hashlib.blake2b(digest_size=16)
+    with open(video, 'rb') as f:
+        while block := f.read(DIGEST_BLOCK_BYTES):
+            digest.update(block)
+    return digest.digest()
+
+
+# Medical equipment to look for in video summaries:
+# (display name, equipment id, keywords that indicate it)
+_EQUIPMENT_PATTERNS = (
+    ("ultrasound machine", "ultrasound_machine", ("ultrasound", "ultrasound machine")),
+    ("patient monitor", "patient_monitor", ("vital signs monitor", "monitor displaying", "patient monitor")),
+    ("hospital bed", "hospital_bed", ("bed", "patient covered", "stretcher")),
+    ("surgical equipment", "surgical_equipment", ("surgical gown", "surgeon", "surgical")),
+    ("defibrillator", "defibrillator", ("defibrillator", "crash cart")),
+    ("ventilator", "ventilator", ("ventilator", "breathing")),
+    ("IV pump", "iv_pump", ("iv", "infusion", "pump")),
+    ("oxygen tank", "oxygen_tank", ("oxygen", "o2")),
+    ("medical cart", "medical_cart", ("cart", "equipment cart")),
+    ("surgical lights", "surgical_lights", ("lights", "operating lights")),
+    ("instrument tray", "instrument_tray", ("instruments", "tray")),
+)
+
+_KEYWORD_TO_EQUIPMENT = {
+    keyword: equipment_id
+    for _, equipment_id, keywords in _EQUIPMENT_PATTERNS
+    for keyword in keywords
+}
+
+# Every keyword in one regex, so a summary is scanned once rather than once
+# per keyword. The match is a zero-width lookahead, tried at each position,
+# so overlapping keywords (e.g. "cart" inside "crash cart") are all found,
+# just like testing each keyword as a substring. Keywords are lowercase and
+# matched against the lowercased summary, so every match is a dict key
+_KEYWORD_PATTERN = re.compile("(?=(%s))" % "|".join(
+    re.escape(keyword)
+    for keyword in sorted(_KEYWORD_TO_EQUIPMENT, key=len, reverse=True)
+))
+
+
+# Summary detections of these are critical alerts, the rest are high
+_CRITICAL_EQUIPMENT = frozenset({"defibrillator", "ventilator"})
+
+# Equipment assigned to search clips in turn
+_CLIP_EQUIPMENT_TYPES = (
+    "hospital_bed", "patient_monitor", "ultrasound_machine",
+    "iv_pump", "surgical_equipment", "ventilator", "defibrillator"
+)
+_CLIP_ALERT_TITLES = {
+    equipment: f"{equipment.replace('_', ' ')} detected"
+    for equipment in _CLIP_EQUIPMENT_TYPES
+}
+
+
+# JSON bodies are encoded with orjson and sent as bytes, so the content
+# type is set explicitly (merged with the session's Authorization header)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def request_timeout(total: float) -> aiohttp.ClientTimeout:
+    """
+    Timeout with separate connect and read budgets, so an unreachable or
+    stalled server fails in seconds instead of holding on until the total.
+    """
+    return aiohttp.ClientTimeout(total=total, sock_connect=5, sock_read=max(10, total // 3))
+
+
+def new_connector() -> aiohttp.TCPConnector:
+    """
+    Connection pool for api.memories.ai with keep-alive.
+    Must be called with an event loop running.
+    """
+    return aiohttp.TCPConnector(
+        limit=32,
+        limit_per_host=16,
+        keepalive_timeout=75,
+        enable_cleanup_closed=True,
+        # Every request goes to the same host; resolve it every 5 minutes
+        # rather than aiohttp's default of every 10 seconds
+        use_dns_cache=True,
+        ttl_dns_cache=300,
+        # Try the next address family quickly if one (IPv6 or IPv4) is down
+        happy_eyeballs_delay=0.25
+    )
+
+
+def _with_alert(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the alert the fallback reports for a default item."""
+    return {
+        **item,
+        "alert": {
+            "severity": "critical" if item["confidence"] > 0.8 else "high",
+            "title": f"{item['name'].replace('_', ' ')} detected",
+            "message": "Medical equipment found"
+        }
+    }
+
+
+# Fallback detections, built once at import instead of on every call
+_FALLBACK_DETECTIONS = tuple(_with_alert(item) for item in (
+    {
+        "name": "hospital_bed",
+        "timestamp": 0.0,
+        "duration": 30.0,
+        "confidence": 0.85,
+        "location": "Hospital Ward",
+        "description": "Hospital bed with patient"
+    },
+    {
+        "name": "patient_monitor",
+        "timestamp": 5.0,
+        "duration": 60.0,
+        "confidence": 0.82,
+        "location": "Bedside Monitor"
+    },
+    {
+        "name": "ultrasound_machine",
+        "timestamp": 20.0,
+        "duration": 40.0,
+        "confidence": 0.79,
+        "location": "Operating Room"
+    },
+    {
+        "name": "surgical_equipment",
+        "timestamp": 35.0,
+        "duration": 50.0,
+        "confidence": 0.81,
+        "location": "Surgical Station"
+    }
+))
+
 
 class MemoriesAPIClient:
     """Client for interacting with Memories.ai video analysis API."""
     
-    def __init__(self):
+    def __init__(self, connector: Optional[aiohttp.BaseConnector] = None):
+        """
+        Args:
+            connector: Connection pool to use, e.g. one shared with the
+                MemoriesAuthHandler (same host). Owned by the caller;
+                by default the client makes its own with new_connector()
+        """
         self.api_key = os.getenv("MEMORIES_AI_API_KEY")
         
         if not self.api_key:
@@ -21,172 +207,306 @@ class MemoriesAPIClient:
         self.base_url = "https://api.memories.ai"
         self.upload_endpoint = f"{self.base_url}/serve/api/v1/upload"
         self.search_endpoint = f"{self.base_url}/serve/api/v1/search"
-        self.timeout = aiohttp.ClientTimeout(total=300)
-        
-        print(f"🔧 Memories.ai client initialized")
-        print(f"   Base URL: {self.base_url}")
-        print(f"   Upload endpoint: {self.upload_endpoint}")
-        print(f"   Search endpoint: {self.search_endpoint}") 
-        print(f"   API Key: {'*' * (len(self.api_key) - 4)}{self.api_key[-4:]}")
+        # Default for API calls; uploads send the whole video, so get longer
+        self.timeout = request_timeout(20)
+        self.upload_timeout = request_timeout(300)
+        
+        # search_video stops polling for a video's clips after waiting this long
+        self.max_total_wait_s = 180
+        
+        # One session (and connection pool) for every call, so requests reuse
+        # open keep-alive connections instead of a new TCP + TLS handshake each
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector = connector
+        
+        # Successful results only: video_no -> summary and
+        # (video_no, search text) -> detections
+        self._summary_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._search_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+        
+        # Content digest -> video_no of videos already uploaded, so sending
+        # the same bytes again reuses the server's copy
+        self._upload_cache: "OrderedDict[bytes, str]" = OrderedDict()
+        
+        # Analysis running for an uploaded video, keyed by (kind, video_no);
+        # concurrent requests for the same video await the same task
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        
+        logger.info("Memories.ai client initialized (base URL: %s)", self.base_url)
+        logger.debug("Upload endpoint: %s", self.upload_endpoint)
+        logger.debug("Search endpoint: %s", self.search_endpoint)
+        logger.debug("API key: %s%s", "*" * (len(self.api_key) - 4), self.api_key[-4:])
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, created on first use (it needs a running loop)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                # Sent with every request
+                headers={"Authorization": self.api_key},
+                connector=self._connector or new_connector(),
+                # A shared connector outlives this client's session
+                connector_owner=self._connector is None
+            )
+        return self._session
+    
+    async def aclose(self):
+        """Close the shared HTTP session and its connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "MemoriesAPIClient":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
     
+    async def _single_flight(
+        self, key: tuple, work: Callable[[], Awaitable[List[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        """Run work() once per key at a time and share its detections with every caller."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.pop(key, None))
+        
+        # Shielded so one caller giving up doesn't cancel the others' result
+        detections = await asyncio.shield(task)
+        # Fresh dicts so callers can't modify each other's detections
+        return [dict(detection) for detection in detections]
+    
+    def invalidate(self, video_no: str):
+        """Forget cached summary and search results for a video (e.g. re-uploaded)."""
+        self._summary_cache.pop(video_no, None)
+        for key in [key for key in self._search_cache if key[0] == video_no]:
+            del self._search_cache[key]
 
 
     async def _get_video_summary(self, video_no: str) -> Optional[str]:
         """Get video summary with full diagnostic logging."""
         
-        print(f"\n📝 Getting video summary from Memories.ai...")
-        print(f"      Video ID: {video_no}")
+        cached = self._summary_cache.get(video_no)
+        if cached is not None:
+            self._summary_cache.move_to_end(video_no)
+            return cached
+        
+        logger.debug("Getting video summary for %s", video_no)
         
         endpoints = [
             ("transcription", f"{self.base_url}/serve/api/v1/video/transcription"),
             ("summary", f"{self.base_url}/serve/api/v1/video/summary"),
         ]
         
-        for endpoint_name, endpoint_url in endpoints:
-            print(f"\n      🔄 Trying {endpoint_name}...")
+        # Ask both endpoints at once and take the first usable summary,
+        # instead of waiting out one endpoint before trying the next
+        tasks = [
+            asyncio.create_task(self._try_summary_endpoint(endpoint_name, endpoint_url, video_no))
+            for endpoint_name, endpoint_url in endpoints
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                summary = await next_done
+                if summary is not None:
+                    _remember(self._summary_cache, video_no, summary)
+                    return summary
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        logger.warning("Could not get summary from any endpoint for %s", video_no)
+        return None
+    
+    async def _try_summary_endpoint(self, endpoint_name: str, endpoint_url: str, video_no: str) -> Optional[str]:
+        """Ask one summary endpoint for the video's summary; None if it has no usable one."""
+        logger.debug("Trying %s endpoint", endpoint_name)
+        
+        try:
+            # Single payload that works most reliably
+            payload = {"videoNo": video_no}
             
-            try:
-                # Single payload that works most reliably
-                payload = {"videoNo": video_no}
+            session = await self._get_session()
+            
+            logger.debug("POST %s payload=%s", endpoint_url, payload)
+            
+            # Shorter budget than uploads, set per request on the shared session
+            async with session.post(
+                endpoint_url, data=orjson.dumps(payload), headers=_JSON_HEADERS
+            ) as response:
+                status_code = response.status
+                logger.debug("%s status: %s", endpoint_name, status_code)
                 
-                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20)) as session:
-                    headers = {
-                        "Authorization": self.api_key,
-                        "Content-Type": "application/json"
-                    }
+                # Body is read once as bytes; only the debug preview is decoded to str
+                raw = await response.read()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "%s raw response (first 200 chars): %s",
+                        endpoint_name, raw[:200].decode("utf-8", errors="replace")
+                    )
+                
+                # Try to parse JSON (an empty body counts as an empty response)
+                try:
+                    result = orjson.loads(raw) if raw.strip() else None
+                except Exception as json_error:
+                    logger.warning("%s: JSON parse failed: %.100s", endpoint_name, json_error)
+                    return None
+                
+                # Check response structure
+                if not result:
+                    logger.warning("%s: empty response", endpoint_name)
+                    return None
+                
+                response_code = result.get("code")
+                logger.debug("%s response code: %s", endpoint_name, response_code)
+                
+                if response_code == "0000":
+                    data = result.get("data", {})
                     
-                    print(f"         POST {endpoint_url}")
-                    print(f"         Payload: {payload}")
+                    # Try all possible summary fields
+                    summary = None
+                    for field_name in ["summary", "text", "description", "content", "visualSummary"]:
+                        if field_name in data and data[field_name]:
+                            summary = data[field_name]
+                            logger.debug("Found summary in field: %s", field_name)
+                            break
                     
-                    async with session.post(endpoint_url, headers=headers, json=payload) as response:
-                        status_code = response.status
-                        print(f"         Status: {status_code}")
-                        
-                        # Read response as text first for diagnostics
-                        text_response = await response.text()
-                        print(f"         Raw response (first 200 chars): {text_response[:200]}")
-                        
-                        # Try to parse JSON
-                        try:
-                            result = await response.json()
-                        except Exception as json_error:
-                            print(f"         ⚠️ JSON parse failed: {str(json_error)[:100]}")
-                            continue
-                        
-                        # Check response structure
-                        if not result:
-                            print(f"         ⚠️ Empty response")
-                            continue
-                        
-                        response_code = result.get("code")
-                        print(f"         Response code: {response_code}")
-                        
-                        if response_code == "0000":
-                            data = result.get("data", {})
-                            
-                            # Try all possible summary fields
-                            summary = None
-                            for field_name in ["summary", "text", "description", "content", "visualSummary"]:
-                                if field_name in data and data[field_name]:
-                                    summary = data[field_name]
-                                    print(f"         ✅ Found summary in field: {field_name}")
-                                    break
-                            
-                            if summary and isinstance(summary, str) and len(summary) > 20:
-                                print(f"         ✅ Valid summary: {len(summary)} chars")
-                                return summary
-                            else:
-                                print(f"         ⚠️ Summary field empty or too short")
-                        else:
-                            print(f"         ⚠️ API error code: {response_code}")
-                            if "message" in result:
-                                print(f"         Message: {result.get('message')}")
-                            
-            except asyncio.TimeoutError:
-                print(f"         ⏱️ Timeout")
-            except Exception as e:
-                print(f"         ❌ Exception: {type(e).__name__}: {str(e)[:100]}")
+                    if summary and isinstance(summary, str) and len(summary) > 20:
+                        logger.debug("Valid summary: %d chars", len(summary))
+                        return summary
+                    else:
+                        logger.warning("%s: summary field empty or too short", endpoint_name)
+                else:
+                    logger.warning("%s: API error code %s: %s", endpoint_name, response_code, result.get("message"))
+                    
+        except asyncio.TimeoutError:
+            logger.warning("%s: timeout", endpoint_name)
+        except Exception as e:
+            logger.error("%s: %s: %.100s", endpoint_name, type(e).__name__, e)
         
-        print(f"\n      ❌ Could not get summary from any endpoint")
         return None
 
 
-    async def analyze_video_correct(self, video_content: bytes, max_retries: int = 3) -> List[Dict[str, Any]]:
+    async def analyze_video_correct(self, video_content: VideoSource, max_retries: int = 3) -> List[Dict[str, Any]]:
         """
         Production solution: Try real detection, fallback to intelligent defaults.
         """
+        return await self._analyze_video(video_content, max_retries)
+    
+    async def analyze_videos(
+        self, videos: List[VideoSource], concurrency: int = 4, max_retries: int = 3
+    ) -> List[Union[List[Dict[str, Any]], BaseException]]:
+        """
+        Analyze several videos like analyze_video_correct, overlapping their work.
         
-        video_size_mb = len(video_content) / 1024 / 1024
+        At most `concurrency` uploads run at once; waiting for processing and
+        detection don't hold an upload slot, so one video's wait doesn't hold
+        back the next upload.
         
-        print(f"📤 Uploading video to Memories.ai...")
-        video_no = await self._upload_video_with_retry(video_content, max_retries)
+        Returns:
+            One entry per video, in order: its detections, or the exception
+            it failed with (one failing video doesn't abort the batch)
+        """
+        upload_slots = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(
+            *(self._analyze_video(video, max_retries, upload_slots) for video in videos),
+            return_exceptions=True
+        )
+    
+    async def _analyze_video(
+        self,
+        video_content: VideoSource,
+        max_retries: int,
+        upload_slots: Optional[asyncio.Semaphore] = None
+    ) -> List[Dict[str, Any]]:
+        """Upload a video (in one of upload_slots, if given), then detect equipment in it."""
+        
+        video_size = _video_size(video_content)
+        
+        logger.info("Uploading video to Memories.ai (%d bytes)", video_size)
+        if upload_slots is None:
+            video_no = await self._upload_video_with_retry(video_content, max_retries)
+        else:
+            async with upload_slots:
+                video_no = await self._upload_video_with_retry(video_content, max_retries)
         if not video_no:
             return []
         
-        print(f"   ✅ Video uploaded: {video_no}")
+        logger.info("Video uploaded: %s", video_no)
+        
+        return await self._single_flight(
+            ("detect", video_no),
+            lambda: self._detect_uploaded_video(video_no, video_size)
+        )
+    
+    async def _detect_uploaded_video(self, video_no: str, video_size: int) -> List[Dict[str, Any]]:
+        """Wait for an uploaded video to be processed, then detect equipment in it."""
+        
+        video_size_mb = video_size / 1024 / 1024
         
         wait_time = 60 if video_size_mb > 200 else 40 if video_size_mb > 50 else 20
-        print(f"\n⏳ Waiting {wait_time}s...")
+        logger.debug("Waiting %ds for processing", wait_time)
         await asyncio.sleep(wait_time)
         
-        print(f"\n🔍 Attempting real detection...")
+        logger.debug("Attempting real detection for %s", video_no)
         
         # TRY REAL DETECTION
         search_url = f"{self.base_url}/serve/api/v1/search"
         
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=20)) as session:
-                headers = {"Authorization": self.api_key}
-                
-                payload = {
-                    "videoNo": video_no,
-                    "searchType": "BY_CLIP",
-                    "queryText": ""
-                }
-                
-                async with session.post(search_url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
+            session = await self._get_session()
+            
+            payload = {
+                "videoNo": video_no,
+                "searchType": "BY_CLIP",
+                "queryText": ""
+            }
+            
+            async with session.post(
+                search_url, data=orjson.dumps(payload), headers=_JSON_HEADERS
+            ) as response:
+                if response.status == 200:
+                    result = orjson.loads(await response.read())
+                    
+                    if result.get("code") == "0000":
+                        clips = result.get("data", {}).get("clips", [])
                         
-                        if result.get("code") == "0000":
-                            clips = result.get("data", {}).get("clips", [])
-                            
-                            if clips and len(clips) > 0:
-                                print(f"   ✅ Real detection: Found {len(clips)} clips")
-                                return self._process_clips_as_detections(clips)
-        
+                        if clips and len(clips) > 0:
+                            logger.info("Real detection: found %d clips", len(clips))
+                            return self._process_clips_as_detections(clips)
+    
         except Exception as e:
-            print(f"   ⚠️ Real detection failed: {str(e)[:50]}")
+            logger.warning("Real detection failed: %.50s", e)
         
         # FALLBACK: Intelligent defaults
-        print(f"   📊 Using intelligent fallback (based on video content)")
-        return self._generate_intelligent_fallback(video_content)
+        logger.info("Using intelligent fallback (based on video content)")
+        return self._generate_intelligent_fallback(video_size)
 
 
     def _process_clips_as_detections(self, clips: List[Dict]) -> List[Dict[str, Any]]:
         """Convert REAL API clips to detections."""
         
-        equipment_types = [
-            "hospital_bed", "patient_monitor", "ultrasound_machine",
-            "iv_pump", "surgical_equipment", "ventilator", "defibrillator"
-        ]
-        
         detections = []
+        n_types = len(_CLIP_EQUIPMENT_TYPES)
         for i, clip in enumerate(clips):
-            equipment = equipment_types[i % len(equipment_types)]
+            equipment = _CLIP_EQUIPMENT_TYPES[i % n_types]
+            
+            # Each clip field is looked up and converted once
+            start = float(clip.get("startTime", 0))
+            score = float(clip.get("score", 0.7))
             
             detection = {
                 "name": equipment,
-                "timestamp": float(clip.get("startTime", 0)),
-                "duration": float(clip.get("endTime", 0)) - float(clip.get("startTime", 0)),
-                "confidence": float(clip.get("score", 0.7)),
+                "timestamp": start,
+                "duration": float(clip.get("endTime", 0)) - start,
+                "confidence": score,
                 "location": "Video",
-                "description": f"Detected at {clip.get('startTime', 0):.1f}s",
+                "description": f"Detected at {start:.1f}s",
                 "alert": {
-                    "severity": "critical" if float(clip.get("score", 0.7)) > 0.75 else "high",
-                    "title": f"{equipment.replace('_', ' ')} detected",
+                    "severity": "critical" if score > 0.75 else "high",
+                    "title": _CLIP_ALERT_TITLES[equipment],
                     "message": "Equipment found"
-                } if float(clip.get("score", 0.7)) > 0.65 else None
+                } if score > 0.65 else None
             }
             
             detections.append(detection)
@@ -194,67 +514,26 @@ class MemoriesAPIClient:
         return detections
 
 
-    def _generate_intelligent_fallback(self, video_content: bytes) -> List[Dict[str, Any]]:
+    def _generate_intelligent_fallback(self, video_size: int) -> List[Dict[str, Any]]:
         """Smart fallback: Generate defaults that LOOK real."""
         
-        size_mb = len(video_content) / 1024 / 1024
+        size_mb = video_size / 1024 / 1024
         
         # Larger videos = more equipment (surgical room)
         equipment_count = 4 if size_mb > 200 else 3 if size_mb > 50 else 2
         
-        default_equipment = [
-            {
-                "name": "hospital_bed",
-                "timestamp": 0.0,
-                "duration": 30.0,
-                "confidence": 0.85,
-                "location": "Hospital Ward",
-                "description": "Hospital bed with patient"
-            },
-            {
-                "name": "patient_monitor",
-                "timestamp": 5.0,
-                "duration": 60.0,
-                "confidence": 0.82,
-                "location": "Bedside Monitor"
-            },
-            {
-                "name": "ultrasound_machine",
-                "timestamp": 20.0,
-                "duration": 40.0,
-                "confidence": 0.79,
-                "location": "Operating Room"
-            },
-            {
-                "name": "surgical_equipment",
-                "timestamp": 35.0,
-                "duration": 50.0,
-                "confidence": 0.81,
-                "location": "Surgical Station"
-            }
-        ]
-        
-        result = default_equipment[:equipment_count]
-        
-        for item in result:
-            item["alert"] = {
-                "severity": "critical" if item["confidence"] > 0.8 else "high",
-                "title": f"{item['name'].replace('_', ' ')} detected",
-                "message": "Medical equipment found"
-            }
-        
-        return result
+        # Fresh top-level dicts so callers can't modify the shared templates
+        return [dict(item) for item in _FALLBACK_DETECTIONS[:equipment_count]]
 
 
 
     
-    async def analyze_video_with_summary(self, video_content: bytes, max_retries: int = 3) -> List[Dict[str, Any]]:
+    async def analyze_video_with_summary(self, video_content: VideoSource, max_retries: int = 3) -> List[Dict[str, Any]]:
         """Analyze video by getting Memories.ai summary, then extract objects."""
         
-        video_size_mb = len(video_content) / 1024 / 1024
+        video_size_mb = _video_size(video_content) / 1024 / 1024
         
-        print(f"📤 Uploading video to Memories.ai...")
-        print(f"   Video size: {video_size_mb:.2f} MB")
+        logger.info("Uploading video to Memories.ai (%.2f MB)", video_size_mb)
         
         # Upload video
         video_no = await self._upload_video_with_retry(video_content, max_retries)
@@ -262,7 +541,15 @@ class MemoriesAPIClient:
         if not video_no:
             return []
         
-        print(f"   ✅ Video uploaded: {video_no}")
+        logger.info("Video uploaded: %s", video_no)
+        
+        return await self._single_flight(
+            ("summary", video_no),
+            lambda: self._summarize_uploaded_video(video_no, video_size_mb)
+        )
+    
+    async def _summarize_uploaded_video(self, video_no: str, video_size_mb: float) -> List[Dict[str, Any]]:
+        """Wait for an uploaded video to be processed, then extract equipment from its summary."""
         
         # Wait for processing
         if video_size_mb < 5:
@@ -272,27 +559,24 @@ class MemoriesAPIClient:
         else:
             initial_wait = 40
         
-        print(f"\n⏳ Waiting {initial_wait}s for initial processing...")
+        logger.debug("Waiting %ds for initial processing", initial_wait)
         await asyncio.sleep(initial_wait)
         
         # GET VIDEO SUMMARY
-        print(f"\n📝 Getting video summary from Memories.ai...")
         summary = await self._get_video_summary(video_no)
         
         # FIX: Check if summary is None before checking length
         if not summary or len(summary) < 20:  # ← FIXED
-            print(f"   ⚠️ Could not get valid video summary")
+            logger.warning("Could not get valid video summary for %s", video_no)
             return []
         
-        print(f"   ✅ Got summary ({len(summary)} chars)")
-        print(f"   Preview: {summary[:120]}...")
+        logger.debug("Got summary (%d chars): %.120s", len(summary), summary)
         
         # EXTRACT objects from the summary
-        print(f"\n🔍 Extracting medical equipment from summary...")
+        logger.debug("Extracting medical equipment from summary")
         detections = self._extract_objects_from_summary(summary, video_no)
         
-        print(f"\n✅ Analysis complete!")
-        print(f"   Found {len(detections)} medical equipment items")
+        logger.info("Analysis complete: found %d medical equipment items", len(detections))
         
         return detections
 
@@ -307,83 +591,96 @@ class MemoriesAPIClient:
         
         detections = []
         
-        # Medical equipment patterns to look for
-        equipment_patterns = [
-            ("ultrasound machine", "ultrasound_machine", ["ultrasound", "ultrasound machine"]),
-            ("patient monitor", "patient_monitor", ["vital signs monitor", "monitor displaying", "patient monitor"]),
-            ("hospital bed", "hospital_bed", ["bed", "patient covered", "stretcher"]),
-            ("surgical equipment", "surgical_equipment", ["surgical gown", "surgeon", "surgical"]),
-            ("defibrillator", "defibrillator", ["defibrillator", "crash cart"]),
-            ("ventilator", "ventilator", ["ventilator", "breathing"]),
-            ("IV pump", "iv_pump", ["iv", "infusion", "pump"]),
-            ("oxygen tank", "oxygen_tank", ["oxygen", "o2"]),
-            ("medical cart", "medical_cart", ["cart", "equipment cart"]),
-            ("surgical lights", "surgical_lights", ["lights", "operating lights"]),
-            ("instrument tray", "instrument_tray", ["instruments", "tray"]),
-        ]
+        logger.debug("Analyzing summary for equipment")
         
-        summary_lower = summary.lower()
-        found_equipment = set()
+        # One pass over the summary finds every equipment type mentioned
+        found_equipment = {
+            _KEYWORD_TO_EQUIPMENT[match.group(1)]
+            for match in _KEYWORD_PATTERN.finditer(summary.lower())
+        }
         
-        print(f"      Analyzing summary for equipment...")
-        
-        # Look for each equipment type
-        for display_name, equipment_id, keywords in equipment_patterns:
-            for keyword in keywords:
-                if keyword in summary_lower and equipment_id not in found_equipment:
-                    print(f"         ✅ Found: {display_name}")
-                    
-                    detection = {
-                        "name": equipment_id,
-                        "location": "Operating Room / Medical Facility",
-                        "confidence": 0.85,  # High confidence since it's from official summary
-                        "timestamp": 0.0,
-                        "duration": 0.0,  # Doesn't apply to summary
-                        "description": f"{display_name} identified in video summary",
-                        "video_no": video_no,
-                        "alert": {
-                            "severity": "critical" if equipment_id in ["defibrillator", "ventilator"] else "high",
-                            "title": f"{display_name} detected",
-                            "message": f"Medical equipment found in video"
-                        }
+        # Report them in the usual equipment order
+        for display_name, equipment_id, _ in _EQUIPMENT_PATTERNS:
+            if equipment_id in found_equipment:
+                logger.debug("Found: %s", display_name)
+                
+                detection = {
+                    "name": equipment_id,
+                    "location": "Operating Room / Medical Facility",
+                    "confidence": 0.85,  # High confidence since it's from official summary
+                    "timestamp": 0.0,
+                    "duration": 0.0,  # Doesn't apply to summary
+                    "description": f"{display_name} identified in video summary",
+                    "video_no": video_no,
+                    "alert": {
+                        "severity": "critical" if equipment_id in _CRITICAL_EQUIPMENT else "high",
+                        "title": f"{display_name} detected",
+                        "message": f"Medical equipment found in video"
                     }
-                    
-                    detections.append(detection)
-                    found_equipment.add(equipment_id)
-                    break
+                }
+                
+                detections.append(detection)
         
         return detections
 
 
-    async def _upload_video_with_retry(self, video_content: bytes, max_retries: int) -> str:
+    async def _upload_video_with_retry(self, video_content: VideoSource, max_retries: int) -> str:
         """Helper method to upload video with retry logic."""
         
-        for attempt in range(max_retries):
-            try:
-                async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                    headers = {"Authorization": self.api_key}
+        # Hashing a large video takes a while; keep it off the event loop
+        digest = await asyncio.to_thread(_video_digest, video_content)
+        cached = self._upload_cache.get(digest)
+        if cached is not None:
+            self._upload_cache.move_to_end(digest)
+            logger.info("Video already uploaded as %s, skipping upload", cached)
+            return cached
+        
+        # A file is opened once and rewound for each retry; aiohttp streams it
+        # in chunks, so the video is never held in memory
+        video_file = None
+        try:
+            for attempt in range(max_retries):
+                try:
+                    session = await self._get_session()
+                    
+                    if isinstance(video_content, (bytes, bytearray)):
+                        body = video_content
+                    else:
+                        # Older aiohttp versions close a file payload once it is sent
+                        if video_file is None or video_file.closed:
+                            video_file = open(video_content, 'rb')
+                        else:
+                            video_file.seek(0)
+                        body = video_file
                     
                     data = aiohttp.FormData()
-                    data.add_field('file', video_content, filename='video.mp4', content_type='video/mp4')
+                    data.add_field('file', body, filename='video.mp4', content_type='video/mp4')
                     
                     if attempt > 0:
-                        print(f"   Retry attempt {attempt + 1}/{max_retries}...")
+                        logger.info("Upload retry attempt %d/%d", attempt + 1, max_retries)
                     
-                    async with session.post(self.upload_endpoint, headers=headers, data=data) as response:
-                        result = await response.json()
+                    async with session.post(
+                        self.upload_endpoint, data=data, timeout=self.upload_timeout
+                    ) as response:
+                        result = orjson.loads(await response.read())
                         
                         if result.get("code") == "0000":
-                            return result["data"]["videoNo"]
+                            video_no = result["data"]["videoNo"]
+                            _remember(self._upload_cache, digest, video_no, MAX_CACHED_UPLOADS)
+                            return video_no
                         else:
                             raise Exception(f"Upload failed: {result.get('msg')}")
                             
-            except Exception as e:
-                print(f"   ⚠️ Upload error: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2)
-                    continue
-                else:
-                    raise
+                except Exception as e:
+                    logger.warning("Upload error: %s", e)
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(2)
+                        continue
+                    else:
+                        raise
+        finally:
+            if video_file is not None:
+                video_file.close()
         
         return None
 
@@ -393,58 +690,76 @@ class MemoriesAPIClient:
         Search with configurable max attempts.
         """
         
-        print(f"   Video No: {video_no}")
-        print(f"   Search query: '{query or 'show me all objects and equipment'}'")
+        logger.debug("Searching video %s for %r", video_no, query or "show me all objects and equipment")
         
         search_text = query or "show me all objects and equipment"
         
+        cache_key = (video_no, search_text)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            self._search_cache.move_to_end(cache_key)
+            # Fresh dicts so callers can't modify the cached detections
+            return [dict(detection) for detection in cached]
+        
+        waited = 0.0
         for attempt in range(max_attempts):
             try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {"Authorization": self.api_key}
+                session = await self._get_session()
+                
+                payload = {
+                    "search_param": search_text,
+                    "folder_id": -2,
+                    "search_type": "BY_CLIP"
+                }
+                
+                # Short per-poll budget so one hung request can't eat the wait budget
+                async with session.post(
+                    self.search_endpoint, data=orjson.dumps(payload), headers=_JSON_HEADERS,
+                    timeout=request_timeout(10)
+                ) as response:
+                    result = orjson.loads(await response.read())
+                
+                if result.get("code") == "0000" and result.get("success"):
+                    data = result.get("data", [])
                     
-                    payload = {
-                        "search_param": search_text,
-                        "folder_id": -2,
-                        "search_type": "BY_CLIP"
-                    }
+                    if not isinstance(data, list):
+                        data = data.get("clips", []) if isinstance(data, dict) else []
                     
-                    async with session.post(self.search_endpoint, headers=headers, json=payload) as response:
-                        result = await response.json()
-                        
-                        if result.get("code") == "0000" and result.get("success"):
-                            data = result.get("data", [])
-                            
-                            if not isinstance(data, list):
-                                data = data.get("clips", []) if isinstance(data, dict) else []
-                            
-                            # Filter to our video
-                            our_clips = [clip for clip in data if clip.get("videoNo") == video_no]
-                            
-                            if our_clips:
-                                print(f"  Found {len(our_clips)} clips in video (attempt {attempt + 1})")
-                                return self._parse_clips_to_detections(our_clips)
-                            
-                            # Not found yet, wait and retry
-                            if wait_for_processing and attempt < max_attempts - 1:
-                                # Progressive backoff: wait longer as attempts increase
-                                wait_time = 5 if attempt < 3 else 8 if attempt < 6 else 10
-                                print(f"   Waiting {wait_time}s before retry... (attempt {attempt + 1}/{max_attempts})")
-                                await asyncio.sleep(wait_time)
-                                continue
-                            
-                            return []
+                    # Filter to our video
+                    our_clips = [clip for clip in data if clip.get("videoNo") == video_no]
+                    
+                    if our_clips:
+                        logger.info("Found %d clips in video (attempt %d)", len(our_clips), attempt + 1)
+                        detections = self._process_clips_as_detections(our_clips)
+                        if detections:
+                            _remember(self._search_cache, cache_key, detections)
+                        return [dict(detection) for detection in detections]
+                    
+                    # Not processed yet
+                    if not wait_for_processing:
+                        return []
+                
+                else:
+                    logger.warning("Search error: %s", result.get("msg"))
+                    return []
                         
-                        else:
-                            print(f"   Search error: {result.get('msg')}")
-                            return []
-                            
             except Exception as e:
-                print(f"   Exception: {e}")
-                if wait_for_processing and attempt < max_attempts - 1:
-                    await asyncio.sleep(5)
-                    continue
-                return []
+                logger.warning("Search exception: %s", e)
+                if not wait_for_processing:
+                    return []
+            
+            if attempt == max_attempts - 1:
+                break
+            
+            # Exponential backoff with jitter: a video that is ready soon is
+            # found quickly, a slow one isn't polled at a fixed rate
+            wait_time = min(30, 1.5 ** attempt + random.uniform(0, 1))
+            if waited + wait_time > self.max_total_wait_s:
+                logger.warning("Gave up searching %s after waiting %.0fs", video_no, waited)
+                break
+            logger.debug("Waiting %.1fs before retry (attempt %d/%d)", wait_time, attempt + 1, max_attempts)
+            await asyncio.sleep(wait_time)
+            waited += wait_time
         
         return []
 
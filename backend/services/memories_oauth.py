@@ -4,11 +4,27 @@ Implements the proper authentication flow as per Memories.ai docs
 """
 
 import os
+import logging
 import aiohttp
 import asyncio
+import time
+import orjson
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Optional
 
+logger = logging.getLogger("meditrack.memories.auth")
+
+# Token requests send orjson-encoded bytes, so the content type is explicit
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Refresh the access token this many seconds before it expires
+REFRESH_MARGIN_SECONDS = 60
+
+# Treat a token as expired this many seconds early, so it isn't used
+# right as the server's clock expires it
+EXPIRY_MARGIN_SECONDS = 5
+
 class MemoriesAuthHandler:
     """
     Handles Memories.ai OAuth authentication flow.
@@ -21,7 +37,13 @@ class MemoriesAuthHandler:
     5. Refresh token when needed
     """
     
-    def __init__(self):
+    def __init__(self, connector: Optional[aiohttp.BaseConnector] = None):
+        """
+        Args:
+            connector: Connection pool to share with MemoriesAPIClient, so token
+                requests reuse its warm connections. Owned by the caller;
+                by default the handler's session makes its own
+        """
         self.api_key = os.getenv("MEMORIES_AI_API_KEY")
         self.client_id = os.getenv("MEMORIES_AI_CLIENT_ID")  # From dashboard
         self.callback_url = os.getenv("MEMORIES_CALLBACK_URL", "http://localhost:8000/api/memories/callback")
@@ -29,23 +51,113 @@ class MemoriesAuthHandler:
         self.access_token: Optional[str] = None
         self.refresh_token: Optional[str] = None
         self.token_expires_at: Optional[datetime] = None
+        # Expiry checks use this time.monotonic() deadline: cheaper than
+        # datetime.now() and unaffected by wall-clock jumps.
+        # token_expires_at is kept for logging and the token file
+        self._expires_at_monotonic: Optional[float] = None
         
         self.auth_base_url = "https://api.memories.ai/auth"
         
-        print(f"🔐 Memories.ai Auth Handler initialized")
-        print(f"   Client ID: {self.client_id[:8]}..." if self.client_id else "   Client ID: Not set")
+        # Tokens are kept on disk so a restart doesn't force a new authorization
+        self.token_file = Path(os.getenv("MEMORIES_TOKEN_FILE", "data/memories_tokens.json"))
+        
+        # One session for all token requests
+        self._connector = connector
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Refreshes the token shortly before it expires, off the request path
+        self._refresh_task: Optional[asyncio.Task] = None
+        
+        self._load_tokens()
+        
+        logger.info(
+            "Memories.ai auth handler initialized (client ID: %s)",
+            f"{self.client_id[:8]}..." if self.client_id else "not set"
+        )
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, created on first use (it needs a running loop)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=self._connector,
+                connector_owner=self._connector is None,
+                # Fail fast if the auth server can't be reached
+                timeout=aiohttp.ClientTimeout(total=15, sock_connect=5, sock_read=10)
+            )
+        return self._session
+    
+    async def aclose(self):
+        """Stop the background refresh and close the HTTP session."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def _load_tokens(self):
+        """Restore tokens saved by a previous run, if any."""
+        try:
+            saved = orjson.loads(self.token_file.read_bytes())
+            self.access_token = saved["access_token"]
+            self.refresh_token = saved.get("refresh_token")
+            self.token_expires_at = datetime.fromisoformat(saved["expires_at"])
+            self._expires_at_monotonic = time.monotonic() + (
+                self.token_expires_at - datetime.now()
+            ).total_seconds()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Ignoring unreadable token file %s: %s", self.token_file, e)
+    
+    def _save_tokens(self):
+        """Write the current tokens to disk, readable by this user only."""
+        try:
+            self.token_file.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(orjson.dumps({
+                    "access_token": self.access_token,
+                    "refresh_token": self.refresh_token,
+                    "expires_at": self.token_expires_at
+                }))
+        except Exception as e:
+            logger.warning("Could not save tokens: %s", e)
+    
+    def _token_obtained(self, expires_in: float):
+        """Record a new token's expiry, persist it and schedule its refresh."""
+        self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
+        self._expires_at_monotonic = time.monotonic() + expires_in
+        self._save_tokens()
+        self._schedule_refresh(expires_in)
+    
+    def _schedule_refresh(self, expires_in: float):
+        """Start the background refresh, replacing any pending one."""
+        task = self._refresh_task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+        if self.refresh_token:
+            self._refresh_task = asyncio.create_task(self._refresh_before_expiry(expires_in))
+    
+    async def _refresh_before_expiry(self, expires_in: float):
+        """Background task: refresh the token shortly before it expires."""
+        await asyncio.sleep(max(0, expires_in - REFRESH_MARGIN_SECONDS))
+        await self.refresh_access_token()
     
     async def authorize_api_key(self):
         """
         Step 1: Authorize API key and set callback URL
         This needs to be done once through their dashboard
         """
-        print("⚠️ API Key authorization must be done manually:")
-        print("   1. Go to https://memories.ai/developer")
-        print("   2. Find your API key")
-        print("   3. Click 'Authorize'")
-        print(f"   4. Set callback URL to: {self.callback_url}")
-        print("   5. Save and wait for authorization code")
+        logger.warning(
+            "API key authorization must be done manually:\n"
+            "   1. Go to https://memories.ai/developer\n"
+            "   2. Find your API key\n"
+            "   3. Click 'Authorize'\n"
+            "   4. Set callback URL to: %s\n"
+            "   5. Save and wait for authorization code",
+            self.callback_url
+        )
     
     async def exchange_code_for_token(self, code: str) -> bool:
         """
@@ -58,34 +170,33 @@ class MemoriesAuthHandler:
             True if token obtained successfully
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.auth_base_url}/getAccessToken"
-                
-                payload = {
-                    "code": code,
-                    "clientId": self.client_id
-                }
-                
-                async with session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        self.access_token = result.get("accessToken")
-                        self.refresh_token = result.get("refreshToken")
-                        expires_in = result.get("expiresIn", 3600)  # seconds
-                        
-                        self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-                        
-                        print(f"✅ Access token obtained")
-                        print(f"   Expires at: {self.token_expires_at}")
-                        
-                        return True
-                    else:
-                        print(f"❌ Failed to get access token: {response.status}")
-                        return False
-                        
+            session = await self._get_session()
+            url = f"{self.auth_base_url}/getAccessToken"
+            
+            payload = {
+                "code": code,
+                "clientId": self.client_id
+            }
+            
+            async with session.post(url, data=orjson.dumps(payload), headers=_JSON_HEADERS) as response:
+                if response.status == 200:
+                    result = orjson.loads(await response.read())
+                    
+                    self.access_token = result.get("accessToken")
+                    self.refresh_token = result.get("refreshToken")
+                    expires_in = result.get("expiresIn", 3600)  # seconds
+                    
+                    self._token_obtained(expires_in)
+                    
+                    logger.info("Access token obtained (expires at %s)", self.token_expires_at)
+                    
+                    return True
+                else:
+                    logger.error("Failed to get access token: %s", response.status)
+                    return False
+                    
         except Exception as e:
-            print(f"❌ Error exchanging code for token: {e}")
+            logger.error("Error exchanging code for token: %s", e)
             return False
     
     async def refresh_access_token(self) -> bool:
@@ -96,35 +207,35 @@ class MemoriesAuthHandler:
             True if token refreshed successfully
         """
         if not self.refresh_token:
-            print("❌ No refresh token available")
+            logger.error("No refresh token available")
             return False
         
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.auth_base_url}/refreshAccessToken"
-                
-                payload = {
-                    "refreshToken": self.refresh_token,
-                    "clientId": self.client_id
-                }
-                
-                async with session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        self.access_token = result.get("accessToken")
-                        expires_in = result.get("expiresIn", 3600)
-                        
-                        self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-                        
-                        print(f"✅ Access token refreshed")
-                        return True
-                    else:
-                        print(f"❌ Failed to refresh token: {response.status}")
-                        return False
-                        
+            session = await self._get_session()
+            url = f"{self.auth_base_url}/refreshAccessToken"
+            
+            payload = {
+                "refreshToken": self.refresh_token,
+                "clientId": self.client_id
+            }
+            
+            async with session.post(url, data=orjson.dumps(payload), headers=_JSON_HEADERS) as response:
+                if response.status == 200:
+                    result = orjson.loads(await response.read())
+                    
+                    self.access_token = result.get("accessToken")
+                    expires_in = result.get("expiresIn", 3600)
+                    
+                    self._token_obtained(expires_in)
+                    
+                    logger.info("Access token refreshed")
+                    return True
+                else:
+                    logger.error("Failed to refresh token: %s", response.status)
+                    return False
+                    
         except Exception as e:
-            print(f"❌ Error refreshing token: {e}")
+            logger.error("Error refreshing token: %s", e)
             return False
     
     async def get_valid_token(self) -> Optional[str]:
@@ -136,24 +247,29 @@ class MemoriesAuthHandler:
         """
         # Check if we have a token
         if not self.access_token:
-            print("⚠️ No access token available")
-            print("   Complete authorization flow first")
+            logger.warning("No access token available, complete the authorization flow first")
             return None
         
-        # Check if token is expired
-        if self.token_expires_at and datetime.now() >= self.token_expires_at:
-            print("🔄 Token expired, refreshing...")
+        # Normally the background task has refreshed the token already; this
+        # covers tokens restored from disk and a refresh that failed
+        deadline = self._expires_at_monotonic
+        if deadline is not None and time.monotonic() >= deadline - EXPIRY_MARGIN_SECONDS:
+            logger.info("Token expired, refreshing")
             if await self.refresh_access_token():
                 return self.access_token
             else:
                 return None
         
+        if self._refresh_task is None and deadline is not None:
+            # Token restored from disk: start its background refresh
+            self._schedule_refresh(deadline - time.monotonic())
+        
         return self.access_token
     
     def is_authenticated(self) -> bool:
         """Check if we have valid authentication"""
         return (
             self.access_token is not None and
-            self.token_expires_at is not None and
-            datetime.now() < self.token_expires_at
+            self._expires_at_monotonic is not None and
+            time.monotonic() < self._expires_at_monotonic - EXPIRY_MARGIN_SECONDS
         )
@@ -4,14 +4,272 @@ Uses topology-aware association with Hungarian algorithm.
 """
 
 from typing import List, Dict, Optional, Tuple
-import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import yaml
+import orjson
 import numpy as np
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra, min_weight_full_bipartite_matching
+from scipy.spatial.distance import cdist
 import networkx as nx
 
+from services.clock import parse_iso_timestamp
+
+logger = logging.getLogger("meditrack.tracking")
+
+try:
+    # Compiles the cost matrix loop to machine code
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    # libyaml's C parser, when PyYAML was built with it
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Loaded topologies, shared by every TrackingService:
+# config path -> (file mtime, attributes set by load_topology)
+# The shared objects (config, graph, distance matrix) are only read
+_topology_cache: Dict[str, Tuple[int, Dict]] = {}
+_TOPOLOGY_ATTRS = (
+    'config', 'nodes', 'edges', 'node_names', 'node_ids',
+    '_cost_params', '_emb_weight', 'graph', '_node_index', '_dist'
+)
+
+# Detection times are compared as whole microseconds since the epoch
+_MICROSECOND = timedelta(microseconds=1)
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _timestamp_us(ts: datetime) -> int:
+    """
+    Whole microseconds since the epoch. Naive times are taken as they are,
+    so differences match subtracting the datetimes directly.
+    """
+    return (ts - (_EPOCH if ts.tzinfo is None else _EPOCH_UTC)) // _MICROSECOND
+
+
+def _detection_us(det: Dict) -> int:
+    """A detection's time in microseconds; parsed detections carry it as 'ts_us'."""
+    ts_us = det.get('ts_us')
+    return _timestamp_us(det['ts']) if ts_us is None else ts_us
+
+
+def _detection_iso(det: Dict) -> str:
+    """
+    A detection's time as an ISO string, formatted once and kept as 'ts_iso'
+    (a detection is often the entry of one link and the exit of the next).
+    """
+    ts_iso = det.get('ts_iso')
+    if ts_iso is None:
+        ts_iso = det['ts_iso'] = det['ts'].isoformat()
+    return ts_iso
+
+
+# Both cost matrix kernels take the exits' and entries' node ids, indices
+# into the distance matrix (-1 for nodes missing from the topology) and
+# times in whole microseconds, and return costs with rows for exits, columns
+# for entries. A pair costs inf if the movement is physically impossible.
+
+def _cost_matrix_numpy(
+    ex_node, ex_idx, ex_ts, en_node, en_idx, en_ts, dist_matrix,
+    normal_speed, time_pad, weight_dist, weight_time
+):
+    """Cost matrix from whole-array expressions over every exit/entry pair."""
+    dist = dist_matrix[ex_idx[:, None], en_idx[None, :]]
+    # Integer differences, so the seconds are exactly timedelta.total_seconds()
+    actual_time = (en_ts[None, :] - ex_ts[:, None]) / 1e6
+    
+    # Expected transit time
+    expected_time = dist / normal_speed
+    
+    # Relaxed gating for demo
+    # Allow 0.3x to 3x expected time (plus padding for waiting)
+    time_lower = expected_time * 0.3  # Can be faster
+    time_upper = expected_time * 3 + time_pad  # Can be slower or waiting
+    
+    # Feasibility gate: different nodes (equipment can't stay in the same
+    # node), a path exists, not going backwards in time, plausible transit
+    feasible = (
+        (ex_node[:, None] != en_node[None, :])
+        & np.isfinite(dist)
+        & (actual_time >= 0)
+        & (actual_time >= time_lower)
+        & (actual_time <= time_upper)
+    )
+    
+    with np.errstate(invalid='ignore'):
+        # Compute cost components (normalized)
+        dist_dev = np.where(dist > 0, np.abs(dist - 20) / 30, 0)  # Normalize to ~20m
+        time_dev = np.abs(actual_time - expected_time) / np.maximum(expected_time, 1)
+        
+        # Combined cost (lower is better)
+        cost = (weight_dist * dist_dev) + (weight_time * time_dev)
+    
+    return np.where(feasible, cost, np.inf)
+
+
+def _cost_matrix_loop(
+    ex_node, ex_idx, ex_ts, en_node, en_idx, en_ts, dist_matrix,
+    normal_speed, time_pad, weight_dist, weight_time
+):
+    """Cost matrix cell by cell; the same gates and costs, written for numba."""
+    C = np.full((len(ex_node), len(en_node)), np.inf)
+    
+    for i in range(len(ex_node)):
+        for j in range(len(en_node)):
+            # Same node - skip (equipment can't stay in same node)
+            if ex_node[i] == en_node[j]:
+                continue
+            
+            dist = dist_matrix[ex_idx[i], en_idx[j]]
+            if dist == np.inf:
+                continue  # No path exists
+            
+            # Skip if going backwards in time
+            actual_time = (en_ts[j] - ex_ts[i]) / 1e6
+            if actual_time < 0:
+                continue
+            
+            expected_time = dist / normal_speed
+            if actual_time < expected_time * 0.3 or actual_time > expected_time * 3 + time_pad:
+                continue
+            
+            dist_dev = abs(dist - 20) / 30 if dist > 0 else 0.0
+            time_dev = abs(actual_time - expected_time) / max(expected_time, 1.0)
+            C[i, j] = (weight_dist * dist_dev) + (weight_time * time_dev)
+    
+    return C
+
+
+# Without numba, matrices with at least this many cells are computed with
+# NumPy; below it the array setup costs more than the interpreted loop
+NUMPY_COST_MIN_CELLS = 32
+
+
+def _cost_matrix_interpreted(
+    ex_node, ex_idx, ex_ts, en_node, en_idx, en_ts, dist_matrix,
+    normal_speed, time_pad, weight_dist, weight_time
+):
+    """Cost matrix without numba: the loop for small matrices, NumPy otherwise."""
+    kernel = _cost_matrix_loop if len(ex_node) * len(en_node) < NUMPY_COST_MIN_CELLS else _cost_matrix_numpy
+    return kernel(
+        ex_node, ex_idx, ex_ts, en_node, en_idx, en_ts, dist_matrix,
+        normal_speed, time_pad, weight_dist, weight_time
+    )
+
+
+# fastmath is left off: it assumes no infs, and unreachable pairs are inf.
+# nogil lets window pairs on the solver pool run the kernel in parallel
+_cost_matrix = (
+    njit(cache=True, nogil=True)(_cost_matrix_loop) if njit is not None else _cost_matrix_interpreted
+)
+
+
+def _embedding_array(detections: List[Dict]) -> Optional[np.ndarray]:
+    """
+    Appearance embeddings as one (N, D) float32 array, or None unless every
+    detection carries an 'embedding' of the same length.
+    """
+    embeddings = [d.get('embedding') for d in detections]
+    if not embeddings or any(e is None for e in embeddings):
+        return None
+    try:
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    except ValueError:
+        return None
+
+
+def _embedding_distance(ex_emb: np.ndarray, en_emb: np.ndarray) -> np.ndarray:
+    """Cosine distances between exit and entry embeddings, in [0, 2]."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dist = cdist(ex_emb, en_emb, metric='cosine')
+    # An all-zero embedding has no direction: count it as unrelated
+    return np.nan_to_num(dist, nan=1.0)
+
+
+# Above this many tracks, association scores them with numpy;
+# below it the array setup costs more than a plain loop
+NUMPY_FINALIZE_MIN_TRACKS = 64
+
+# Cost matrices at least this large with fewer than this fraction of
+# feasible pairs are matched as a sparse graph; below the size the dense
+# solver is faster
+SPARSE_MATCHING_MIN_CELLS = 10_000
+SPARSE_MATCHING_MAX_DENSITY = 0.25
+
+
+def _assign(C: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minimum-cost matching of exits (rows) to entries (columns), where inf
+    marks an infeasible pair. Returns row and column indices like
+    linear_sum_assignment; pairs that are still infeasible must be skipped.
+    """
+    finite = np.isfinite(C)
+    n_finite = np.count_nonzero(finite)
+    
+    if C.size >= SPARSE_MATCHING_MIN_CELLS and n_finite < SPARSE_MATCHING_MAX_DENSITY * C.size:
+        rows, cols = np.nonzero(finite)
+        # Shifted by 1 since zero weights would be dropped as missing edges;
+        # every full matching has the same number of edges, so the best is unchanged
+        graph = csr_matrix((C[rows, cols] + 1, (rows, cols)), shape=C.shape)
+        try:
+            return min_weight_full_bipartite_matching(graph)
+        except ValueError:
+            pass  # No full matching, solved densely below
+    
+    # Infeasible pairs cost more than all feasible ones together, so the
+    # solver matches as many feasible pairs as it can instead of failing
+    penalty = C[finite].sum() + 1
+    return linear_sum_assignment(np.where(finite, C, penalty))
+
+
+# Association solves window pairs on a thread pool when there are at least
+# this many, and the largest cost matrix has at least this many cells.
+# The numba kernel (compiled with nogil), NumPy's array operations and
+# scipy's assignment solvers release the GIL; the interpreted cost loop
+# used without numba for small matrices does not
+PARALLEL_MIN_WINDOW_PAIRS = 8
+PARALLEL_MIN_CELLS = 1024
+
+_solver_pool: Optional[ThreadPoolExecutor] = None
+_solver_pool_lock = threading.Lock()
+
+
+def _get_solver_pool() -> Optional[ThreadPoolExecutor]:
+    """Threads shared by every TrackingService, or None on a single CPU."""
+    global _solver_pool
+    cpus = os.cpu_count() or 1
+    if _solver_pool is None and cpus > 1:
+        with _solver_pool_lock:
+            if _solver_pool is None:
+                _solver_pool = ThreadPoolExecutor(
+                    max_workers=min(4, cpus), thread_name_prefix="track-solver"
+                )
+    return _solver_pool
+
+
+def shutdown_solver_pool():
+    """Stop the solver threads; a later association starts new ones."""
+    global _solver_pool
+    with _solver_pool_lock:
+        pool, _solver_pool = _solver_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
 
 class TrackingService:
     """
@@ -25,28 +283,83 @@ class TrackingService:
         self.config_path = config_path
         self.nodes = []
         self.edges = []
+        # node id -> name and lowercase name -> node id, rebuilt whenever
+        # the topology is loaded
+        self.node_names: Dict[int, str] = {}
+        self.node_ids: Dict[str, int] = {}
         self.graph = None
-        self.shortest_paths = {}
+        # Shortest-path distances as a dense matrix, indexed through
+        # _node_index (node id -> row/column); unreachable pairs are inf
+        self._node_index: Dict[int, int] = {}
+        self._dist = np.empty((0, 0))
         self.config = {}
+        # Cost matrix parameters, read from the config by load_topology()
+        self._cost_params: Tuple[float, float, float, float] = self._read_cost_params()
+        # Weight of the appearance term, used when detections carry embeddings
+        self._emb_weight: float = self._read_emb_weight()
+        # Tracks live in SQLite, one row per track keyed by track_id
+        # tracks.json is only read to migrate tracks saved by older versions
+        self.tracks_db = Path("data/tracks.db")
         self.tracks_file = Path("data/tracks.json")
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        
+        # Parsed tracks, read from disk once and refreshed on every write
+        self._tracks_cache: Optional[List[Dict]] = None
+        self._tracks_by_id: Dict[str, Dict] = {}
+        # Bumped by set_tracks() so a deferred write of older tracks is skipped
+        self._tracks_generation = 0
         
     def load_topology(self):
-        """Load topology configuration from YAML."""
+        """
+        Load topology configuration from YAML.
+        Parsed once per file version and reused by other instances.
+        """
         try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+            cached = _topology_cache.get(self.config_path)
+            if cached is not None and cached[0] == mtime:
+                self.__dict__.update(cached[1])
+                return
+            
             with open(self.config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
+                self.config = yaml.load(f, Loader=_YamlLoader)
             
             self.nodes = self.config.get('nodes', [])
             self.edges = self.config.get('edges', [])
+            self.node_names = {node['id']: node['name'] for node in self.nodes}
+            # Reversed so the first node with a given name wins, as in a scan
+            self.node_ids = {node['name'].lower(): node['id'] for node in reversed(self.nodes)}
             
+            self._cost_params = self._read_cost_params()
+            self._emb_weight = self._read_emb_weight()
             self._build_graph()
             self._compute_shortest_paths()
             
+            _topology_cache[self.config_path] = (
+                mtime, {attr: getattr(self, attr) for attr in _TOPOLOGY_ATTRS}
+            )
+            
         except FileNotFoundError:
             raise Exception(f"Topology config not found: {self.config_path}")
         except Exception as e:
             raise Exception(f"Failed to load topology: {e}")
     
+    def _read_cost_params(self) -> Tuple[float, float, float, float]:
+        """(normal speed, time padding, distance weight, time weight) from the config."""
+        speed_config = self.config.get('speed_config', {})
+        assoc_config = self.config.get('association', {})
+        return (
+            speed_config.get('normal_mps', 1.3),
+            speed_config.get('time_pad_s', 8),
+            assoc_config.get('dist_weight', 0.4),
+            assoc_config.get('time_weight', 0.4)
+        )
+    
+    def _read_emb_weight(self) -> float:
+        """Appearance embedding weight from the config."""
+        return self.config.get('association', {}).get('emb_weight', 0.2)
+    
     def _build_graph(self):
         """Build NetworkX graph from nodes and edges."""
         self.graph = nx.Graph()
@@ -63,36 +376,41 @@ class TrackingService:
     
     def _compute_shortest_paths(self):
         """Precompute shortest paths between all node pairs."""
-        self.shortest_paths = {}
+        node_ids = list(self.graph.nodes())
+        self._node_index = {node_id: i for i, node_id in enumerate(node_ids)}
         
-        for source in self.graph.nodes():
-            try:
-                lengths = nx.single_source_dijkstra_path_length(
-                    self.graph, source, weight='weight'
-                )
-                self.shortest_paths[source] = lengths
-            except Exception:
-                pass
+        n = len(node_ids)
+        edges = list(self.graph.edges(data='weight'))
+        rows = [self._node_index[a] for a, _, _ in edges]
+        cols = [self._node_index[b] for _, b, _ in edges]
+        weights = [w for _, _, w in edges]
+        adjacency = csr_matrix((weights, (rows, cols)), shape=(n, n))
+        
+        # One extra row and column of inf: nodes missing from the topology
+        # get index -1, so every distance to or from them is unreachable
+        self._dist = np.full((n + 1, n + 1), np.inf)
+        # All sources in one compiled call; unreachable pairs come back inf
+        self._dist[:n, :n] = dijkstra(adjacency, directed=False)
     
     def get_distance(self, from_node_id: int, to_node_id: int) -> Optional[float]:
-        """Get distance between two nodes."""
-        if from_node_id not in self.shortest_paths:
+        """Get distance between two nodes, or None if there is no path."""
+        i = self._node_index.get(from_node_id)
+        j = self._node_index.get(to_node_id)
+        if i is None or j is None:
             return None
-        return self.shortest_paths[from_node_id].get(to_node_id)
+        dist = self._dist[i, j]
+        return float(dist) if np.isfinite(dist) else None
     
     def get_node_name(self, node_id: int) -> str:
         """Get node name by ID."""
-        for node in self.nodes:
-            if node['id'] == node_id:
-                return node['name']
-        return f"Node {node_id}"
+        name = self.node_names.get(node_id)
+        if name is None:
+            return f"Node {node_id}"
+        return name
     
     def get_node_id(self, node_name: str) -> Optional[int]:
-        """Get node ID by name."""
-        for node in self.nodes:
-            if node['name'].lower() == node_name.lower():
-                return node['id']
-        return None
+        """Get node ID by name (case-insensitive)."""
+        return self.node_ids.get(node_name.lower())
     
     def build_cost_matrix(
         self,
@@ -105,64 +423,77 @@ class TrackingService:
         Cost is infinity if movement is physically impossible.
         Otherwise, cost reflects distance/time/appearance deviation.
         """
-        n_exits = len(exits)
-        n_entries = len(entries)
-        C = np.full((n_exits, n_entries), np.inf)
+        if not exits or not entries:
+            return np.full((len(exits), len(entries)), np.inf)
         
-        config = self.config.get('speed_config', {})
-        normal_speed = config.get('normal_mps', 1.3)
-        urgent_speed = config.get('urgent_mps', 2.2)
-        time_pad = config.get('time_pad_s', 8)
+        normal_speed, time_pad, weight_dist, weight_time = self._cost_params
         
-        for i, exit_det in enumerate(exits):
-            for j, entry_det in enumerate(entries):
-                from_node = exit_det['node_id']
-                to_node = entry_det['node_id']
-                
-                # Same node - skip (equipment can't stay in same node)
-                if from_node == to_node:
-                    continue
-                
-                # Get distance
-                dist = self.get_distance(from_node, to_node)
-                if dist is None:
-                    continue  # No path exists
-                
-                # Calculate transit times
-                t_exit = exit_det['ts']
-                t_entry = entry_det['ts']
-                actual_time = (t_entry - t_exit).total_seconds()
-                
-                # Skip if going backwards in time
-                if actual_time < 0:
-                    continue
-                
-                # Expected transit time
-                expected_time = dist / normal_speed
-                
-                # Relaxed gating for demo
-                # Allow 0.5x to 3x expected time
-                time_lower = expected_time * 0.3  # Can be faster
-                time_upper = expected_time * 3 + time_pad  # Can be slower or waiting
-                
-                # Feasibility gate
-                if actual_time < time_lower or actual_time > time_upper:
-                    continue
-                
-                # Compute cost components (normalized)
-                dist_dev = abs(dist - 20) / 30 if dist > 0 else 0  # Normalize to ~20m
-                time_dev = abs(actual_time - expected_time) / max(expected_time, 1)
-                
-                # Combined cost (lower is better)
-                assoc_config = self.config.get('association', {})
-                weight_dist = assoc_config.get('dist_weight', 0.4)
-                weight_time = assoc_config.get('time_weight', 0.4)
-                
-                cost = (weight_dist * dist_dev) + (weight_time * time_dev)
-                C[i, j] = cost
+        ex_node, ex_idx, ex_ts = self._detection_arrays(exits)
+        en_node, en_idx, en_ts = self._detection_arrays(entries)
         
+        C = _cost_matrix(
+            ex_node, ex_idx, ex_ts, en_node, en_idx, en_ts, self._dist,
+            normal_speed, time_pad, weight_dist, weight_time
+        )
+        
+        ex_emb = _embedding_array(exits)
+        en_emb = _embedding_array(entries)
+        if ex_emb is not None and en_emb is not None and ex_emb.shape[1] == en_emb.shape[1]:
+            C += self._emb_weight * _embedding_distance(ex_emb, en_emb)
         return C
-
+    
+    def _detection_arrays(
+        self,
+        detections: List[Dict]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Detections as parallel arrays: node ids, their distance matrix
+        indices, and times in whole microseconds.
+        """
+        n = len(detections)
+        node = np.fromiter((d['node_id'] for d in detections), dtype=np.int64, count=n)
+        node_idx = np.fromiter(
+            (self._node_index.get(d['node_id'], -1) for d in detections), dtype=np.int64, count=n
+        )
+        ts = np.fromiter((_detection_us(d) for d in detections), dtype=np.int64, count=n)
+        return node, node_idx, ts
+    
+    @staticmethod
+    def _exits_and_entries(
+        node: np.ndarray,
+        ts: np.ndarray,
+        window_bounds: List[int]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Reduce every window to one exit and one entry per node.
+        
+        Takes the time-sorted detections' node ids and times, and the
+        windows' boundaries. For each window, returns the indices of the
+        exits and of the entries, in order of each node's first appearance
+        in the window. The exit is the node's last detection (the first
+        one at its latest time), the entry its first detection.
+        """
+        n_windows = len(window_bounds) - 1
+        window = np.repeat(np.arange(n_windows), np.diff(window_bounds))
+        
+        # One group per (window, node); first[g] is where group g first appears
+        _, node_code = np.unique(node, return_inverse=True)
+        key = window * (node_code.max() + 1) + node_code
+        _, first, group = np.unique(key, return_index=True, return_inverse=True)
+        
+        # Latest time per group, then the earliest detection at that time
+        latest = np.full(len(first), np.iinfo(np.int64).min)
+        np.maximum.at(latest, group, ts)
+        at_latest = np.flatnonzero(ts == latest[group])
+        _, first_at_latest = np.unique(group[at_latest], return_index=True)
+        last = at_latest[first_at_latest]
+        
+        # Groups by first appearance, which also keeps the windows in order
+        order = np.argsort(first)
+        first = first[order]
+        last = last[order]
+        splits = np.searchsorted(first, window_bounds[1:-1])
+        return list(zip(np.split(last, splits), np.split(first, splits)))
     
     def compute_link_confidence(
         self,
@@ -187,7 +518,7 @@ class TrackingService:
         to_node = self.get_node_name(entry_det['node_id'])
         
         dist = self.get_distance(exit_det['node_id'], entry_det['node_id'])
-        actual_time = (entry_det['ts'] - exit_det['ts']).total_seconds()
+        actual_time = (_detection_us(entry_det) - _detection_us(exit_det)) / 1e6
         expected_time = dist / 1.3 if dist else 0
         
         reasons = [
@@ -204,6 +535,8 @@ class TrackingService:
     ) -> List[Dict]:
         """
         Associate detections into equipment tracks using normal mode.
+        
+        Groups detections into 5-second windows and applies Hungarian assignment.
         """
         if not detections:
             return []
@@ -216,7 +549,7 @@ class TrackingService:
                 ts = det.get('ts')
                 if isinstance(ts, str):
                     # Parse ISO format string
-                    ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+                    ts = parse_iso_timestamp(ts)
                 elif not isinstance(ts, datetime):
                     # Skip invalid timestamps
                     continue
@@ -224,91 +557,68 @@ class TrackingService:
                 parsed_det = {
                     'det_id': det.get('det_id'),
                     'ts': ts,
+                    'ts_us': _timestamp_us(ts),
                     'class': det.get('class', 'equipment'),
                     'node_id': int(det.get('node_id', 1)),
-                    'score': float(det.get('score', 0.8))
+                    'score': float(det.get('score', 0.8)),
+                    'embedding': det.get('embedding')
                 }
                 parsed_detections.append(parsed_det)
             except Exception as e:
-                print(f"Warning: Skipping invalid detection - {e}")
+                logger.warning("Skipping invalid detection: %s", e)
                 continue
         
         if not parsed_detections:
             return []
-
-        """
-        Associate detections into equipment tracks using normal mode.
         
-        Groups detections into 5-second windows and applies Hungarian assignment.
-        """
-        if not detections:
-            return []
+        # The detections as parallel arrays, sorted by timestamp; everything
+        # below works on indices into them. The sort is stable, so detections
+        # at the same time keep their request order
+        node, node_idx, ts = self._detection_arrays(parsed_detections)
+        order = np.argsort(ts, kind='stable')
+        node, node_idx, ts = node[order], node_idx[order], ts[order]
+        parsed_detections = [parsed_detections[i] for i in order.tolist()]
+        # Appearance embeddings only count when every detection has one
+        emb = _embedding_array(parsed_detections)
         
-        # Sort by timestamp
-        sorted_dets = sorted(parsed_detections, key=lambda d: d['ts'])
+        # Create time windows (5 second buckets) as [start, end) index ranges.
+        # A window holds everything within 5s of its first detection, so each
+        # boundary is a binary search from the previous one
+        window_bounds = [0]
+        while window_bounds[-1] < len(ts):
+            window_end = np.searchsorted(ts, ts[window_bounds[-1]] + 5_000_000, side='right')
+            window_bounds.append(int(window_end))
         
-        # Create time windows (5 second buckets)
-        windows = []
-        current_window = []
-        current_time = sorted_dets[0]['ts']
+        # Process windows and build tracks
+        tracks = []
+        open_tracks = defaultdict(deque)  # node_id -> partial tracks, newest last
         
-        for det in sorted_dets:
-            if (det['ts'] - current_time).total_seconds() > 5:
-                if current_window:
-                    windows.append(current_window)
-                current_window = [det]
-                current_time = det['ts']
-            else:
-                current_window.append(det)
+        # Exits and entries of every window, as indices into the arrays
+        window_ends = self._exits_and_entries(node, ts, window_bounds)
         
-        if current_window:
-            windows.append(current_window)
+        # Exits from each node in one window paired with entries to each
+        # node in the next
+        pairs = [
+            (window_ends[i][0], window_ends[i + 1][1])
+            for i in range(len(window_ends) - 1)
+        ]
         
-        # Process windows and build tracks
-        tracks = []
-        open_tracks = {}  # node_id -> list of partial tracks
+        def solve(pair):
+            return self._solve_window_pair(node, node_idx, ts, emb, *pair)
         
-        for window_idx in range(len(windows) - 1):
-            prev_window = windows[window_idx]
-            curr_window = windows[window_idx + 1]
-            
-            # Find exits from each node in previous window
-            exits_by_node = {}
-            for det in prev_window:
-                node_id = det['node_id']
-                if node_id not in exits_by_node:
-                    exits_by_node[node_id] = det
-                else:
-                    # Keep the last detection (exit)
-                    if det['ts'] > exits_by_node[node_id]['ts']:
-                        exits_by_node[node_id] = det
-            
-            exits = list(exits_by_node.values())
-            
-            # Find entries to each node in current window
-            entries_by_node = {}
-            for det in curr_window:
-                node_id = det['node_id']
-                if node_id not in entries_by_node:
-                    entries_by_node[node_id] = det
-                else:
-                    # Keep the first detection (entry)
-                    if det['ts'] < entries_by_node[node_id]['ts']:
-                        entries_by_node[node_id] = det
-            
-            entries = list(entries_by_node.values())
-            
-            if not exits or not entries:
-                continue
-            
-            # Build cost matrix and solve assignment
-            C = self.build_cost_matrix(exits, entries)
-            
-            if np.all(np.isinf(C)):
+        # A pair's assignment only depends on its two windows, so large
+        # batches are solved in parallel; tracks are still built in order
+        pool = None
+        if len(pairs) >= PARALLEL_MIN_WINDOW_PAIRS and max(
+            len(exits) * len(entries) for exits, entries in pairs
+        ) >= PARALLEL_MIN_CELLS:
+            pool = _get_solver_pool()
+        solutions = pool.map(solve, pairs) if pool is not None else map(solve, pairs)
+        
+        for (exits, entries), (C, row_ind, col_ind) in zip(pairs, solutions):
+            if not len(row_ind):
                 continue  # No valid assignments
             
-            row_ind, col_ind = linear_sum_assignment(C)
-            
             # Process matches
             matched_exits = set()
             matched_entries = set()
@@ -317,8 +627,8 @@ class TrackingService:
                 if np.isinf(C[r, c]):
                     continue
                 
-                exit_det = exits[r]
-                entry_det = entries[c]
+                exit_det = parsed_detections[exits[r]]
+                entry_det = parsed_detections[entries[c]]
                 cost = C[r, c]
                 
                 link_conf = self.compute_link_confidence(exit_det, entry_det, cost)
@@ -328,8 +638,9 @@ class TrackingService:
                 from_node = exit_det['node_id']
                 to_node = entry_det['node_id']
                 
-                if from_node in open_tracks and open_tracks[from_node]:
-                    track = open_tracks[from_node].pop()
+                node_tracks = open_tracks.get(from_node)
+                if node_tracks:
+                    track = node_tracks.pop()
                 else:
                     track = {
                         'track_id': self._generate_track_id(),
@@ -344,15 +655,13 @@ class TrackingService:
                     'to_node_id': to_node,
                     'from_node_name': self.get_node_name(from_node),
                     'to_node_name': self.get_node_name(to_node),
-                    't_exit': exit_det['ts'].isoformat(),
-                    't_entry': entry_det['ts'].isoformat(),
+                    't_exit': _detection_iso(exit_det),
+                    't_entry': _detection_iso(entry_det),
                     'confidence': link_conf,
                     'reasons': reasons
                 })
                 
                 # Store for potential extension
-                if to_node not in open_tracks:
-                    open_tracks[to_node] = []
                 open_tracks[to_node].append(track)
                 
                 matched_exits.add(r)
@@ -360,53 +669,261 @@ class TrackingService:
             
             # Finalize unmatched exits
             for i in range(len(exits)):
-                if i not in matched_exits and exits[i]['node_id'] in open_tracks:
-                    track = open_tracks[exits[i]['node_id']].pop()
-                    self._finalize_track(track)
-                    tracks.append(track)
+                if i in matched_exits:
+                    continue
+                node_tracks = open_tracks.get(parsed_detections[exits[i]]['node_id'])
+                if node_tracks:
+                    tracks.append(node_tracks.pop())
         
-        # Finalize remaining open tracks
+        # Remaining open tracks are done too
         for node_tracks in open_tracks.values():
-            for track in node_tracks:
-                self._finalize_track(track)
-                tracks.append(track)
+            tracks.extend(node_tracks)
+        
+        # Links are final now; score every track at once
+        self._finalize_tracks(tracks)
         
         return tracks
     
+    def _solve_window_pair(
+        self,
+        node: np.ndarray,
+        node_idx: np.ndarray,
+        ts: np.ndarray,
+        emb: Optional[np.ndarray],
+        exits: np.ndarray,
+        entries: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cost matrix between exits and entries (indices into the detection
+        arrays) and its assignment: (C, row_ind, col_ind). emb holds the
+        detections' appearance embeddings, or None to go by topology alone.
+        """
+        normal_speed, time_pad, weight_dist, weight_time = self._cost_params
+        
+        # Build cost matrix and solve assignment
+        C = _cost_matrix(
+            node[exits], node_idx[exits], ts[exits],
+            node[entries], node_idx[entries], ts[entries], self._dist,
+            normal_speed, time_pad, weight_dist, weight_time
+        )
+        if emb is not None:
+            # Infeasible pairs stay inf
+            C += self._emb_weight * _embedding_distance(emb[exits], emb[entries])
+        
+        # Exits and entries with no feasible pairing can't be matched;
+        # leaving them out shrinks the (cubic) assignment problem
+        finite = np.isfinite(C)
+        rows = np.flatnonzero(finite.any(axis=1))
+        if not len(rows):
+            return C, rows, rows
+        cols = np.flatnonzero(finite.any(axis=0))
+        
+        row_ind, col_ind = _assign(C[np.ix_(rows, cols)])
+        return C, rows[row_ind], cols[col_ind]
+    
     def _finalize_track(self, track: Dict):
         """Finalize a track and compute overall confidence."""
         if track['links']:
             link_confidences = [link['confidence'] for link in track['links']]
-            # Geometric mean
-            track['confidence'] = round(
-                np.prod(link_confidences) ** (1 / len(link_confidences)), 3
-            )
+            # Geometric mean, as the mean of logs so long tracks don't
+            # underflow; any zero-confidence link makes it zero
+            if min(link_confidences) > 0:
+                track['confidence'] = round(
+                    math.exp(math.fsum(map(math.log, link_confidences)) / len(link_confidences)), 3
+                )
+            else:
+                track['confidence'] = 0.0
         else:
             track['confidence'] = 0
         
         if track['confidence'] < 0.5:
             track['status'] = 'needs_review'
     
+    def _finalize_tracks(self, tracks: List[Dict]):
+        """
+        Finalize many tracks. Above NUMPY_FINALIZE_MIN_TRACKS, the geometric
+        means of all tracks come from one pass over every link's confidence.
+        """
+        if len(tracks) < NUMPY_FINALIZE_MIN_TRACKS:
+            for track in tracks:
+                self._finalize_track(track)
+            return
+        
+        counts = np.fromiter((len(t['links']) for t in tracks), dtype=np.int64, count=len(tracks))
+        confidences = np.fromiter(
+            (link['confidence'] for t in tracks for link in t['links']),
+            dtype=np.float64, count=int(counts.sum())
+        )
+        
+        # Per-track sums of logs; a zero-confidence link gives -inf, and so a
+        # zero geometric mean. Tracks without links can't be summed by reduceat
+        has_links = counts > 0
+        with np.errstate(divide='ignore'):
+            log_sums = np.add.reduceat(np.log(confidences), (np.cumsum(counts) - counts)[has_links])
+        means = np.zeros(len(tracks))
+        means[has_links] = np.exp(log_sums / counts[has_links])
+        
+        for track, mean in zip(tracks, means.tolist()):
+            track['confidence'] = round(mean, 3)
+            if track['confidence'] < 0.5:
+                track['status'] = 'needs_review'
+    
     def _generate_track_id(self) -> str:
         """Generate a unique track ID."""
-        import uuid
-        return str(uuid.uuid4())
+        return uuid.uuid4().hex
     
-    def save_tracks(self, tracks: List[Dict]):
-        """Save tracks to JSON file."""
+    def _get_db(self) -> sqlite3.Connection:
+        """Open the tracks database, creating the schema on first use."""
+        if self._db is None:
+            self.tracks_db.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.tracks_db, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS tracks ("
+                "track_id TEXT PRIMARY KEY, "
+                "confidence REAL, "
+                "status TEXT, "
+                "payload TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_tracks_status ON tracks(status)")
+            db.commit()
+            self._db = db
+            self._migrate_json_tracks()
+        return self._db
+    
+    def _migrate_json_tracks(self):
+        """Import tracks.json into an empty database, then set the file aside."""
+        if not self.tracks_file.exists():
+            return
+        if self._db.execute("SELECT 1 FROM tracks LIMIT 1").fetchone():
+            return
         try:
-            self.tracks_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.tracks_file, 'w') as f:
-                json.dump(tracks, f, indent=2, default=str)
-        except Exception as e:
-            print(f"Error saving tracks: {e}")
+            tracks = orjson.loads(self.tracks_file.read_bytes())
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?)",
+                    [self._track_row(t) for t in tracks]
+                )
+            self.tracks_file.rename(self.tracks_file.with_suffix(".json.migrated"))
+        except Exception:
+            logger.exception("Error migrating tracks")
+    
+    @staticmethod
+    def _track_row(track: Dict) -> Tuple:
+        """Database row for a track: indexed columns plus the full JSON."""
+        return (
+            track['track_id'],
+            float(track['confidence']),
+            track['status'],
+            # Link confidences are numpy floats from the cost matrix;
+            # anything else orjson can't encode is stored as its str()
+            orjson.dumps(track, option=orjson.OPT_SERIALIZE_NUMPY, default=str).decode()
+        )
+    
+    def _cache_tracks(self, tracks: List[Dict]):
+        """Keep tracks in memory, indexed by track_id."""
+        self._tracks_cache = tracks
+        self._tracks_by_id = {t['track_id']: t for t in tracks}
+    
+    def set_tracks(self, tracks: List[Dict]) -> int:
+        """
+        Replace all tracks in memory, visible to readers immediately.
+        Returns the generation to pass to write_tracks() to persist them.
+        """
+        with self._db_lock:
+            self._cache_tracks(tracks)
+            self._tracks_generation += 1
+            return self._tracks_generation
+    
+    def write_tracks(self, generation: int):
+        """
+        Persist the tracks in memory, replacing the stored tracks.
+        Does nothing if newer tracks have been set since set_tracks()
+        returned generation (they are written instead). The tracks are
+        read when the write runs, so update_track() and delete_track()
+        calls made in between are kept.
+        """
+        try:
+            with self._db_lock:
+                if generation != self._tracks_generation:
+                    return
+                tracks = self._tracks_cache
+                db = self._get_db()
+                with db:
+                    db.execute("DELETE FROM tracks")
+                    db.executemany(
+                        "INSERT INTO tracks VALUES (?, ?, ?, ?)",
+                        [self._track_row(t) for t in tracks]
+                    )
+        except Exception:
+            logger.exception("Error saving tracks")
+    
+    def save_tracks(self, tracks: List[Dict]):
+        """Replace all stored tracks."""
+        self.write_tracks(self.set_tracks(tracks))
+    
+    def update_track(self, track: Dict):
+        """Write a single changed track (e.g. a new status)."""
+        self.load_tracks()
+        # The cache changes under the same lock as the row, so a pending
+        # write_tracks() sees either neither or both
+        with self._db_lock:
+            try:
+                db = self._get_db()
+                with db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?)",
+                        self._track_row(track)
+                    )
+            except Exception:
+                logger.exception("Error saving track")
+            
+            if self._tracks_by_id.get(track['track_id']) is not track:
+                self._tracks_by_id[track['track_id']] = track
+                self._tracks_cache = [
+                    t for t in self._tracks_cache if t['track_id'] != track['track_id']
+                ] + [track]
+    
+    def delete_track(self, track_id: str):
+        """Delete a single track."""
+        self.load_tracks()
+        # Same lock as write_tracks(), so a pending bulk write can't
+        # restore the track from a stale list
+        with self._db_lock:
+            try:
+                db = self._get_db()
+                with db:
+                    db.execute("DELETE FROM tracks WHERE track_id = ?", (track_id,))
+            except Exception:
+                logger.exception("Error deleting track")
+            
+            if self._tracks_by_id.pop(track_id, None) is not None:
+                self._tracks_cache = [
+                    t for t in self._tracks_cache if t['track_id'] != track_id
+                ]
     
     def load_tracks(self) -> List[Dict]:
-        """Load tracks from JSON file."""
+        """
+        Load tracks, reading the database only on first use.
+        The returned list is the cache itself; write changes back with
+        save_tracks(), update_track() or delete_track().
+        """
+        if self._tracks_cache is not None:
+            return self._tracks_cache
+        
+        tracks = []
         try:
-            if self.tracks_file.exists():
-                with open(self.tracks_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading tracks: {e}")
-        return []
+            with self._db_lock:
+                rows = self._get_db().execute(
+                    "SELECT payload FROM tracks ORDER BY rowid"
+                ).fetchall()
+            tracks = [orjson.loads(row[0]) for row in rows]
+        except Exception:
+            logger.exception("Error loading tracks")
+        self._cache_tracks(tracks)
+        return tracks
+    
+    def get_track(self, track_id: str) -> Optional[Dict]:
+        """Get a single track by ID."""
+        self.load_tracks()
+        return self._tracks_by_id.get(track_id)
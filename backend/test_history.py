@@ -0,0 +1,92 @@
+"""
+Test upload history storage.
+Run: python test_history.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+
+import orjson
+
+# History lives in data/ under the working directory; use a scratch one
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+from routers import history
+
+print("=" * 60)
+print("TESTING UPLOAD HISTORY")
+print("=" * 60)
+
+# ===== Test 1: Legacy duplicates are all deleted =====
+print("\n1. Deleting a video with duplicate records:")
+
+history.HISTORY_FILE.write_bytes(orjson.dumps([
+    {"video_id": "a", "detections": 1, "alerts": 0},
+    {"video_id": "b", "detections": 2, "alerts": 1},
+    {"video_id": "a", "detections": 3, "alerts": 0},
+]))
+asyncio.run(history.delete_history_record("a"))
+
+records = history.load_history()
+print(f"   Remaining: {[r['video_id'] for r in records]}")
+assert [r["video_id"] for r in records] == ["b"]
+assert history.get_history_stats()["detections"] == 2
+
+# ===== Test 2: Re-adding a video replaces its record =====
+print("\n2. Re-adding a video:")
+
+history.add_history_entry("b", "b.mp4", 10, 4, 0)
+history.add_history_entry("c", "c.mp4", 10, 1, 0)
+records = history.load_history()
+print(f"   Records: {[r['video_id'] for r in records]}")
+assert [r["video_id"] for r in records] == ["c", "b"]
+assert records[1]["detections"] == 4
+
+# ===== Test 3: Concurrent adds =====
+print("\n3. Adding from several threads:")
+
+
+def add_many(worker):
+    for i in range(30):
+        history.add_history_entry(f"v{worker}-{i}", "clip.mp4", 1, 1, 0)
+
+
+threads = [threading.Thread(target=add_many, args=(w,)) for w in range(4)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+
+on_disk = orjson.loads(history.HISTORY_FILE.read_bytes())
+print(f"   Records kept: {len(on_disk)} (max {history.MAX_HISTORY})")
+assert len(on_disk) == history.MAX_HISTORY
+assert on_disk == history.load_history()
+assert os.listdir(history.HISTORY_FILE.parent) == [history.HISTORY_FILE.name]
+
+# ===== Test 4: Oversized history files keep the newest records =====
+print("\n4. Loading a history file with 150 records:")
+
+# Written most recent first, like add_history_entry does
+history.HISTORY_FILE.write_bytes(orjson.dumps([
+    {"video_id": f"old-{150 - i}", "detections": 1, "alerts": 0}
+    for i in range(150)
+]))
+records = history.load_history()
+print(f"   Kept: {len(records)}, newest {records[0]['video_id']}, oldest {records[-1]['video_id']}")
+assert len(records) == history.MAX_HISTORY
+assert records[0]["video_id"] == "old-150"
+assert records[-1]["video_id"] == "old-51"
+
+history.add_history_entry("new", "new.mp4", 1, 1, 0)
+records = history.load_history()
+assert [r["video_id"] for r in records[:2]] == ["new", "old-150"]
+assert len(records) == history.MAX_HISTORY
+
+history.save_history([{"video_id": f"v{i}"} for i in range(150)])
+assert history.load_history()[0]["video_id"] == "v0"
+
+print("\nALL TESTS PASSED!")
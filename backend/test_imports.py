@@ -15,7 +15,7 @@ try:
     print("✅")
     
     print("3. Testing memory store...", end=" ")
-    from memory.memory_store import memory_store
+    from memory.memory_store import get_memory_store
     print("✅")
     
     print("4. Testing Memories.ai client...", end=" ")
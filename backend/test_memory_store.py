@@ -0,0 +1,77 @@
+"""
+Test the persistent memory store.
+Run: python test_memory_store.py
+"""
+
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from memory.memory_store import MemoryStore
+from memory.memory_types import ObjectMemory
+
+print("=" * 60)
+print("TESTING MEMORY STORE")
+print("=" * 60)
+
+data_dir = Path(tempfile.mkdtemp())
+
+# ===== Test 1: Import memories saved by older versions =====
+print("\n1. Importing object_memories.json:")
+
+# The old format: one JSON array, datetimes written with default=str
+legacy = [
+    ObjectMemory(
+        object_name="Ventilator",
+        location_description="ICU bay 3",
+        confidence=0.9,
+        timestamp=datetime(2025, 11, 4, 12, 5)
+    ),
+    ObjectMemory(
+        object_name="wheelchair",
+        location_description="lobby",
+        confidence=0.7,
+        timestamp=datetime(2025, 11, 4, 12, 10, 30, 250)
+    ),
+]
+(data_dir / "object_memories.json").write_text(
+    json.dumps([m.model_dump() for m in legacy], indent=2, default=str)
+)
+
+store = MemoryStore(data_dir=str(data_dir))
+memories = store.get_object_memories()
+print(f"   Loaded: {[(m.object_name, m.location_description) for m in memories]}")
+assert [m.id for m in memories] == [m.id for m in reversed(legacy)]
+assert memories[0].timestamp == legacy[1].timestamp
+assert not (data_dir / "object_memories.json").exists()
+assert (data_dir / "object_memories.json.migrated").exists()
+
+# ===== Test 2: Imported memories persist in the JSONL log =====
+print("\n2. Reloading after the import:")
+
+store.store_object_memory(ObjectMemory(
+    object_name="ventilator",
+    location_description="OR 2",
+    confidence=0.8
+))
+
+reloaded = MemoryStore(data_dir=str(data_dir))
+names = [m.object_name for m in reloaded.get_object_memories()]
+print(f"   Loaded: {names}")
+assert len(names) == 3
+assert len(reloaded.get_object_memories(object_name="ventilator")) == 2
+
+# ===== Test 3: Counting memories per object =====
+print("\n3. Counting memories:")
+
+count = reloaded.count_object_memories("VENTILATOR")
+print(f"   Ventilator: {count}, wheelchair: {reloaded.count_object_memories('wheelchair')}")
+assert count == 2
+assert reloaded.count_object_memories("wheelchair") == 1
+assert reloaded.count_object_memories("defibrillator") == 0
+
+reloaded.delete_object_memory(legacy[0].id)
+assert reloaded.count_object_memories("ventilator") == 1
+
+print("\nALL TESTS PASSED!")
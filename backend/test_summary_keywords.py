@@ -0,0 +1,42 @@
+"""
+Test equipment extraction from video summaries.
+Run: python test_summary_keywords.py
+"""
+
+import os
+
+os.environ.setdefault("MEMORIES_AI_API_KEY", "test")
+
+from services.memories_ai_client import MemoriesAPIClient
+
+print("=" * 60)
+print("TESTING SUMMARY KEYWORD EXTRACTION")
+print("=" * 60)
+
+client = MemoriesAPIClient()
+
+
+def found(summary):
+    return {d["name"] for d in client._extract_objects_from_summary(summary, "VI-test")}
+
+
+# ===== Test 1: Keywords in any case =====
+print("\n1. Mixed-case summary:")
+
+names = found("A Ventilator next to the PATIENT MONITOR")
+print(f"   Found: {sorted(names)}")
+assert "ventilator" in names
+assert "patient_monitor" in names
+
+# ===== Test 2: Non-ASCII case folding =====
+print("\n2. Summaries with non-ASCII letters:")
+
+# Letters like 'ſ', 'İ' and 'ı' fold to ASCII under case-insensitive
+# matching but not under lower(); they must never crash extraction
+for summary in ("The ſurgeon used a ventilator", "İV line", "cart ıv"):
+    names = found(summary)
+    print(f"   {summary!r}: {sorted(names)}")
+
+assert "ventilator" in found("The ſurgeon used a ventilator")
+
+print("\nALL TESTS PASSED!")
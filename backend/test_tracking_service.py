@@ -0,0 +1,135 @@
+"""
+Test track storage and association in the tracking service.
+Run: python test_tracking_service.py
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import orjson
+from scipy.optimize import linear_sum_assignment
+
+from services.tracking_service import TrackingService, _assign
+
+print("=" * 60)
+print("TESTING TRACKING SERVICE")
+print("=" * 60)
+
+CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "topology.yaml")
+data_dir = Path(tempfile.mkdtemp())
+
+
+def make_service() -> TrackingService:
+    """A service whose track storage lives in the scratch directory."""
+    service = TrackingService(config_path=CONFIG)
+    service.tracks_db = data_dir / "tracks.db"
+    service.tracks_file = data_dir / "tracks.json"
+    return service
+
+
+def make_track(track_id: str, confidence: float) -> dict:
+    return {
+        "track_id": track_id,
+        "class": "ventilator",
+        "links": [{"from_node_id": 1, "to_node_id": 2, "confidence": confidence}],
+        "confidence": confidence,
+        "status": "active"
+    }
+
+
+# ===== Test 1: tracks.json is migrated into the database =====
+print("\n1. Migrating tracks.json:")
+
+legacy = [make_track("a", 0.9), make_track("b", 0.4)]
+(data_dir / "tracks.json").write_bytes(orjson.dumps(legacy))
+
+tracks = make_service().load_tracks()
+print(f"   Loaded: {[t['track_id'] for t in tracks]}")
+assert tracks == legacy
+assert not (data_dir / "tracks.json").exists()
+assert (data_dir / "tracks.json.migrated").exists()
+
+# A fresh service reads them back from the database
+assert make_service().load_tracks() == legacy
+
+# ===== Test 2: update_track / delete_track round-trips =====
+print("\n2. Updating and deleting single tracks:")
+
+service = make_service()
+track = service.get_track("b")
+track["status"] = "confirmed"
+service.update_track(track)
+service.delete_track("a")
+
+reloaded = make_service()
+print(f"   Stored: {[(t['track_id'], t['status']) for t in reloaded.load_tracks()]}")
+assert reloaded.get_track("a") is None
+assert reloaded.get_track("b")["status"] == "confirmed"
+assert len(reloaded.load_tracks()) == 1
+
+# A track not in the cache is added by update_track
+service.update_track(make_track("c", 0.7))
+assert [t["track_id"] for t in make_service().load_tracks()] == ["b", "c"]
+
+# ===== Test 3: A deferred bulk write keeps later single-track changes =====
+print("\n3. Deleting a track before its deferred write runs:")
+
+service = make_service()
+generation = service.set_tracks([make_track("d", 0.9), make_track("e", 0.8)])
+service.delete_track("d")
+track = service.get_track("e")
+track["status"] = "confirmed"
+service.update_track(track)
+service.write_tracks(generation)
+
+stored = make_service().load_tracks()
+print(f"   Stored: {[(t['track_id'], t['status']) for t in stored]}")
+assert [t["track_id"] for t in stored] == ["e"]
+assert stored[0]["status"] == "confirmed"
+
+# ===== Test 4: Sparse and dense assignment agree =====
+print("\n4. Assigning a large, sparse cost matrix:")
+
+rng = np.random.default_rng(0)
+C = rng.random((150, 120))
+C[rng.random(C.shape) > 0.05] = np.inf
+C = C[np.isfinite(C).any(axis=1)][:, np.isfinite(C).any(axis=0)]
+
+rows, cols = _assign(C)
+matched = np.isfinite(C[rows, cols])
+# Reference: dense solver with a large finite penalty for infeasible pairs
+penalty = np.where(np.isfinite(C), C, 1e6)
+ref_rows, ref_cols = linear_sum_assignment(penalty)
+ref_matched = penalty[ref_rows, ref_cols] < 1e6
+print(f"   Matched pairs: {matched.sum()} (reference {ref_matched.sum()})")
+assert matched.sum() == ref_matched.sum()
+assert np.isclose(C[rows, cols][matched].sum(), C[ref_rows, ref_cols][ref_matched].sum())
+
+# ===== Test 5: Appearance embeddings =====
+print("\n5. Association with appearance embeddings:")
+
+service = make_service()
+service.load_topology()
+t0 = datetime(2025, 11, 4, 12, 0)
+detections = [
+    {"det_id": i, "ts": t0 + timedelta(seconds=12 * i), "node_id": node, "class": "ventilator"}
+    for i, node in enumerate((1, 2, 3))
+]
+
+plain = service.build_cost_matrix(detections[:2], detections[1:])
+for det in detections:
+    det["embedding"] = [1.0, 0.0, 0.0]
+same = service.build_cost_matrix(detections[:2], detections[1:])
+detections[2]["embedding"] = [0.0, 1.0, 0.0]
+different = service.build_cost_matrix(detections[:2], detections[1:])
+
+print(f"   Costs 1→2: plain {plain[0, 0]:.3f}, same look {same[0, 0]:.3f}")
+print(f"   Costs 2→3: same look {same[1, 1]:.3f}, different look {different[1, 1]:.3f}")
+assert np.array_equal(np.isinf(plain), np.isinf(different))
+assert np.allclose(plain[np.isfinite(plain)], same[np.isfinite(same)])
+assert np.isclose(different[1, 1], plain[1, 1] + service._emb_weight)
+
+print("\nALL TESTS PASSED!")